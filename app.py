@@ -2,12 +2,21 @@ import streamlit as st
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import json
-import re
 import time
 import random
-import urllib.parse
 import streamlit.components.v1 as components
+from gemini import robust_api_call, stream_api_call, background, resolved, complete, Partial, MAX_OUTPUT
+from prompts import breakdown_prompt, recipe_prompt, express_prompt, rescale_prompt, recipe_key, persona
+from recipe import Ingredients, Recipe, clean_step
+from store import GLOBAL_DISHES
+import store
+import substitutes
+from dishes import catalog
+import mealplan
+import cache
+from metrics import metrics
+
+rerun_started = time.perf_counter()
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Sous", page_icon="🍳", layout="wide")
@@ -129,7 +138,12 @@ else:
 
 # --- 3. CONFIGURATION & LOGIC ---
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+FAKE_BACKEND = os.getenv("SOUS_BACKEND") == "fake"
+if FAKE_BACKEND:
+    # Offline development and benchmarks (see fakegemini.py)
+    import fakegemini
+    fakegemini.install()
+api_key = os.getenv("GOOGLE_API_KEY") or ("fake" if FAKE_BACKEND else None)
 
 if not api_key:
     try:
@@ -139,49 +153,52 @@ if not api_key:
         st.stop()
 
 genai.configure(api_key=api_key)
-
-def get_working_model():
-    try:
-        all_models = [m for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        flash_models = [m.name for m in all_models if 'flash' in m.name.lower()]
-        if flash_models: return genai.GenerativeModel(flash_models[0])
-        pro_models = [m.name for m in all_models if 'pro' in m.name.lower()]
-        if pro_models: return genai.GenerativeModel(pro_models[0])
-        if all_models: return genai.GenerativeModel(all_models[0].name)
-        return genai.GenerativeModel("models/gemini-pro")
-    except:
-        return genai.GenerativeModel("models/gemini-1.5-flash")
-
-model = get_working_model()
+STREAMING = os.getenv("SOUS_STREAM", "1") != "0"
+PREFETCH = os.getenv("SOUS_PREFETCH", "1") != "0"
+EXPRESS_DEFAULT = os.getenv("SOUS_EXPRESS", "0") == "1"
+metrics.register("cache", cache.responses.stats)
+
+# --- ADMIN (hidden): open with ?admin=<SOUS_ADMIN_TOKEN> ---
+admin_token = os.getenv("SOUS_ADMIN_TOKEN")
+if admin_token and st.query_params.get("admin") == admin_token:
+    st.title("Sous / Admin")
+    st.markdown("**LATENCY (ms)**")
+    st.dataframe([{k: round(v * 1000, 1) if k not in ("stage", "count") else v for k, v in row.items()} for row in metrics.summary()], use_container_width=True)
+    st.markdown("**COUNTERS**")
+    with metrics.lock: counters = dict(metrics.counters)
+    sources = metrics.source_values()
+    st.dataframe([{"source": "events", "name": k, "value": v} for k, v in sorted(counters.items())] +
+                 [{"source": src, "name": k, "value": v} for src, vals in sorted(sources.items()) for k, v in sorted(vals.items())], use_container_width=True)
+    st.markdown("**TOKENS PER CALL**")
+    calls = {row["stage"][4:]: row["count"] for row in metrics.summary() if row["stage"].startswith("api.")}
+    st.dataframe([{"stage": stage, "calls": n, "prompt": round(counters.get(f"tokens.{stage}.prompt", 0) / n),
+                   "output": round(counters.get(f"tokens.{stage}.output", 0) / n),
+                   "thinking": round(counters.get(f"tokens.{stage}.thinking", 0) / n), "budget": MAX_OUTPUT.get(stage),
+                   "truncated": sources.get("calls", {}).get(f"truncated.{stage}", 0)} for stage, n in sorted(calls.items())],
+                 use_container_width=True)
+    st.download_button("Prometheus snapshot", metrics.prometheus(), file_name="metrics.prom")
+    st.stop()
 
 # --- HELPER FUNCTIONS ---
-def clean_list(raw_list):
-    clean_items = []
-    IGNORE_LIST = ["none", "null", "n/a", "undefined", "", "missing", "optional", "core", "character", "must_haves", "soul"]
-    if isinstance(raw_list, list):
-        for item in raw_list:
-            if isinstance(item, list): clean_items.extend(clean_list(item))
-            elif isinstance(item, str):
-                s = item.strip().replace("- ", "").replace("* ", "")
-                if len(s) > 2 and s.lower() not in IGNORE_LIST: clean_items.append(s)
-            elif isinstance(item, dict): clean_items.extend(clean_list(list(item.values())))
-    return clean_items
-
-def robust_api_call(prompt):
-    try:
-        response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-        return json.loads(response.text)
-    except:
-        try:
-            response = model.generate_content(prompt)
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            match = re.search(r'\{.*\}', text, re.DOTALL)
-            if match: return json.loads(match.group(0))
-        except Exception as e:
-            return f"ERROR: {str(e)}"
-
-def copy_to_clipboard_button(text, is_vibe):
-    escaped_text = text.replace("\n", "\\n").replace("\"", "\\\"")
+def render_live_recipe(partial, is_vibe):
+    m1, m2, m3 = st.columns(3)
+    meta = partial.get('meta') or {}
+    m1.metric("PREP", meta.get('prep_time', '--'))
+    m2.metric("COOK", meta.get('cook_time', '--'))
+    m3.metric("LEVEL", meta.get('difficulty', '--'))
+    c_ing, c_step = st.columns([1, 2])
+    with c_ing:
+        with st.container(border=True):
+            st.markdown("**THE LOOT DROP**" if is_vibe else "**INVENTORY**")
+            for item in partial.get('ingredients_list', []): st.markdown(f"- {item}")
+    with c_step:
+        with st.container(border=True):
+            st.markdown("**THE TUTORIAL**" if is_vibe else "**EXECUTION**")
+            for idx, step in enumerate(partial.get('steps', [])):
+                st.markdown(f"**{idx+1}.** {clean_step(step)}")
+
+def copy_to_clipboard_button(escaped_text, is_vibe):
+    # escaped_text: already safe inside a double-quoted JS string (Recipe.copy_js)
     if is_vibe:
         btn_style = "background-color: #000; color: #00FF00; border: 2px solid #00FF00; box-shadow: 4px 4px 0px #00FF00; font-family: 'Space Mono', monospace; border-radius: 0px;"
         btn_text = "SAVE THIS DRIP"
@@ -204,8 +221,8 @@ def copy_to_clipboard_button(text, is_vibe):
         """, height=60
     )
 
-def speak_text_button(text, is_vibe):
-    escaped_text = text.replace("\n", " ").replace("\"", "'")
+def speak_text_button(escaped_text, is_vibe):
+    # escaped_text: already safe inside a double-quoted JS string (Recipe.speech_js)
     if is_vibe:
         btn_play = "background-color: #000; color: #00FF00; border: 2px solid #00FF00; box-shadow: 4px 4px 0px #00FF00; font-family: 'Space Mono', monospace; border-radius: 0px;"
         btn_stop = "background-color: #000; color: #FF00FF; border: 2px solid #FF00FF; box-shadow: 4px 4px 0px #FF00FF; font-family: 'Space Mono', monospace; border-radius: 0px;"
@@ -232,7 +249,37 @@ def speak_text_button(text, is_vibe):
         """, height=70
     )
 
-GLOBAL_DISHES = ["Shakshuka", "Pad Thai", "Chicken Tikka Masala", "Beef Wellington", "Bibimbap", "Moussaka", "Paella", "Ramen", "Tacos"]
+def queue_status(is_vibe):
+    # -> (placeholder, on_queue) for robust_api_call: says how many requests are ahead while we wait for a slot
+    note = st.empty()
+    def on_queue(ahead):
+        if is_vibe: note.caption(f"⏳ THE KITCHEN IS PACKED. {ahead} AHEAD OF YOU. HOLD THE LINE.")
+        else: note.caption(f"⏳ Busy kitchen: {ahead} request{'s' if ahead != 1 else ''} ahead of yours.")
+    return note, on_queue
+
+def prefetched(future):
+    # The speculative result if it finished or is in flight; None if it is still queued behind other
+    # background work (cancelled, so the live call goes ahead now), failed, or was cut short
+    if not future.done() and future.cancel(): return None
+    result = future.result()
+    return result if complete(result) else None
+
+def render_plan(plan, is_vibe):
+    core, character = plan.shopping.sections()
+    st.caption(f"{len(plan.ingredients)}/{len(plan.dishes)} dishes · {len(plan.shopping)} items")
+    c1, c2 = st.columns(2)
+    for col, items, title in ((c1, core, "**THE OGs**" if is_vibe else "**🧱 Must Have**"),
+                              (c2, character, "**THE DRIP**" if is_vibe else "**✨ Flavor**")):
+        with col:
+            st.markdown(title)
+            for item in items:
+                shared = f" *(x{len(item.dishes)}: {', '.join(item.dishes)})*" if len(item.dishes) > 1 else ""
+                st.markdown(f"- {item.name}{shared}")
+    for dish, error in plan.errors.items(): st.warning(f"{dish}: {error}")
+    if plan.partial: st.warning("Cut short, so some items may be missing: " + ", ".join(plan.partial))
+    if plan.done:
+        st.download_button("📥 SAVE THE HAUL" if is_vibe else "📥 Download Shopping List", plan.text(),
+                           file_name="shopping_list.txt", use_container_width=True)
 
 # --- STATE ---
 if "ingredients" not in st.session_state: st.session_state.ingredients = None
@@ -240,6 +287,9 @@ if "dish_name" not in st.session_state: st.session_state.dish_name = ""
 if "recipe_data" not in st.session_state: st.session_state.recipe_data = None
 if "trigger_search" not in st.session_state: st.session_state.trigger_search = False
 if "toast_shown" not in st.session_state: st.session_state.toast_shown = False
+if "prefetch" not in st.session_state: st.session_state.prefetch = None
+if "servings" not in st.session_state: st.session_state.servings = None
+if "meal_plan" not in st.session_state: st.session_state.meal_plan = None
 
 # --- UI LAYOUT ---
 c_title, c_surprise = st.columns([4, 1])
@@ -257,6 +307,16 @@ with c_surprise:
     if st.button("🎲 Surprise Me", use_container_width=True):
         st.session_state.dish_name = random.choice(GLOBAL_DISHES)
         st.session_state.trigger_search = True
+        st.session_state.surprise = True   # lowest-priority interactive call when the kitchen is busy
+
+def pick_dish():
+    if st.session_state.dish_pick:
+        st.session_state.dish_name = st.session_state.dish_pick
+        st.session_state.trigger_search = True
+
+# Type-ahead over known dishes (seeds, pre-generated and past queries); free text still goes in the form
+st.selectbox("Known dishes", catalog.suggestions(), index=None, key="dish_pick", on_change=pick_dish,
+             placeholder="🔎 Start typing a dish we already know...", label_visibility="collapsed")
 
 # INPUT
 with st.form("input_form"):
@@ -269,36 +329,104 @@ with st.form("input_form"):
             dish_input = st.text_input("What are you craving?", value=val, placeholder="e.g. Carbonara...")
     with col2:
         servings = st.slider("Servings", 1, 8, 2)
+        express = st.toggle("⚡ Express", value=EXPRESS_DEFAULT, help="Breakdown and recipe in one go")
     
     if vibe_mode:
         submitted = st.form_submit_button("🔥 BET / LET'S COOK", use_container_width=True)
     else:
         submitted = st.form_submit_button("Let's Cook", use_container_width=True)
 
+# MEAL PLAN
+# Several dishes at once: breakdowns fan out concurrently and merge into one shopping list as each lands
+with st.expander("🗓️ MEAL PREP ERA (MULTI-DISH)" if vibe_mode else "🗓️ Meal Plan: several dishes at once"):
+    with st.form("plan_form"):
+        plan_text = st.text_area("Dishes", placeholder="One per line, e.g.\nPad Thai\nShakshuka\nRamen")
+        plan_servings = st.slider("Servings per dish", 1, 8, 2, key="plan_servings")
+        planned = st.form_submit_button("🛒 BUILD THE HAUL" if vibe_mode else "Plan It", use_container_width=True)
+    if planned:
+        plan = mealplan.MealPlan(mealplan.parse_dishes(plan_text), plan_servings)
+        if not plan.dishes: st.warning("Add at least one dish.")
+        progress, board = st.empty(), st.empty()
+        for n, (dish, data) in enumerate(mealplan.breakdowns(plan.dishes, plan_servings), 1):
+            plan.add(dish, data)
+            progress.progress(n / len(plan.dishes), text=f"{dish} ✓ ({n}/{len(plan.dishes)})")
+            with board.container(): render_plan(plan, vibe_mode)
+        progress.empty()
+        st.session_state.meal_plan = plan if plan.dishes else None
+    elif st.session_state.meal_plan:
+        render_plan(st.session_state.meal_plan, vibe_mode)
+
 # LOGIC
 if submitted or st.session_state.trigger_search:
     final_dish = dish_input if submitted else st.session_state.dish_name
-    if final_dish:
+    priority = "surprise" if st.session_state.pop("surprise", False) and not submitted else None
+    # Canonical name: "carbonara pasta" and "Spaghetti Carbonara" share cache entries, store rows and prompts
+    if final_dish: final_dish = catalog.canonical(final_dish)
+    same_dish = submitted and bool(final_dish) and cache.normalize(final_dish) == cache.normalize(st.session_state.dish_name)
+    if same_dish and st.session_state.ingredients and servings != st.session_state.servings:
+        # RESCALE: same dish, new headcount; the checklist stays, amounts are scaled locally
+        st.session_state.trigger_search = False
+        if st.session_state.prefetch: st.session_state.prefetch[1].cancel()
+        st.session_state.prefetch = None
+        r = st.session_state.recipe_data
+        if r is not None:
+            r, unparsed = r.rescaled(servings)
+            if unparsed:
+                # Only the lines we couldn't read go to the model ("juice of half a lemon")
+                lines = [r.ingredients_list[n] for n in unparsed]
+                note, on_queue = queue_status(vibe_mode)
+                fixed = robust_api_call(rescale_prompt(lines, st.session_state.servings, servings), stage="rescale", on_queue=on_queue)
+                note.empty()
+                items = fixed.get("items") if isinstance(fixed, dict) else None
+                if isinstance(items, list) and len(items) == len(lines):
+                    data = r.to_dict()
+                    for n, item in zip(unparsed, items): data["ingredients_list"][n] = str(item)
+                    r = Recipe(r.dish, data, servings)
+            st.session_state.recipe_data = r
+        st.session_state.servings = servings
+    elif final_dish:
         st.session_state.dish_name = final_dish
+        st.session_state.servings = servings
         st.session_state.trigger_search = False
         st.session_state.ingredients = None
         st.session_state.recipe_data = None
         st.session_state.toast_shown = False
+        if st.session_state.prefetch: st.session_state.prefetch[1].cancel()
+        st.session_state.prefetch = None
         
         with st.spinner(f"Loading Assets for: {final_dish}..."):
-            prompt = f"""
-            Dish: {final_dish} for {servings} people.
-            Task: Break down ingredients into exactly 2 categories.
-            OUTPUT JSON STRUCTURE ONLY:
-            {{ "core": ["Ing 1", "Ing 2"], "character": ["Ing 3", "Ing 4"] }}
-            RULES: 1. Core = Non-negotiables. 2. Character = Spices/Herbs. 3. No Nulls.
-            """
-            data = robust_api_call(prompt)
-            if isinstance(data, dict): st.session_state.ingredients = data
+            # Fully determined by (dish, servings), so repeat dishes skip the model entirely
+            cache_key = cache.make_key("breakdown", final_dish, servings)
+            data = store.recipes.get_breakdown(final_dish, servings) or cache.responses.get(cache_key)
+            note, on_queue = queue_status(vibe_mode)
+            if data is None and express:
+                # EXPRESS: one call for both; the recipe is reused unless the user unchecks something
+                data = robust_api_call(express_prompt(final_dish, servings, vibe_mode), stage="express", priority=priority, on_queue=on_queue)
+                if isinstance(data, dict):
+                    default_recipe = data.pop("recipe", None)
+                    if isinstance(default_recipe, dict) and not complete(data):
+                        # Cut off somewhere: shown as such, never cached or reused
+                        default_recipe = Partial(default_recipe)
+                    if complete(data): cache.responses.put(cache_key, data)
+                    if isinstance(default_recipe, dict):
+                        st.session_state.recipe_data = Recipe(final_dish, default_recipe, servings)
+                        default_key = recipe_key(final_dish, servings, vibe_mode, Ingredients.from_response(data).all, [])
+                        if complete(default_recipe): st.session_state.prefetch = (default_key, resolved(default_recipe))
+            elif data is None:
+                data = robust_api_call(breakdown_prompt(final_dish, servings), stage="breakdown", priority=priority, on_queue=on_queue)
+                if complete(data): cache.responses.put(cache_key, data)
+            note.empty()
+            if isinstance(data, dict):
+                st.session_state.ingredients = Ingredients.from_response(data)
+                catalog.add(final_dish)
             else: st.error(f"System Failure. Details: {data}")
 
 # DASHBOARD
-if st.session_state.ingredients:
+# A fragment: ticking an ingredient reruns only the checklist and its Generate gating,
+# not the style blocks, the form or the recipe card
+@st.fragment
+def dashboard(vibe_mode, servings):
+    fragment_started = time.perf_counter()
     if not st.session_state.toast_shown:
         if vibe_mode:
             st.toast("WE ARE LOCKED IN. 🔒", icon="🎒")
@@ -306,17 +434,26 @@ if st.session_state.ingredients:
             st.toast("Mise en place ready.", icon="🧑‍🍳")
         st.session_state.toast_shown = True
 
-    data = st.session_state.ingredients
-    data_lower = {k.lower(): v for k, v in data.items()}
-    raw_core = data_lower.get('core') or data_lower.get('must_haves') or []
-    raw_char = data_lower.get('character') or data_lower.get('soul') or []
-    if not raw_core and not raw_char:
-        all_lists = [v for v in data.values() if isinstance(v, list)]
-        if len(all_lists) > 0: raw_core = all_lists[0]
-        if len(all_lists) > 1: raw_char = all_lists[1]
-    
-    list_core = clean_list(raw_core)
-    list_character = clean_list(raw_char)
+    list_core, list_character = st.session_state.ingredients.core, st.session_state.ingredients.character
+    if st.session_state.ingredients.partial:
+        if vibe_mode: st.warning("⚠️ THE LIST GOT CUT OFF MID-SENTENCE. SOME INGREDIENTS MIGHT BE GHOSTING. RUN IT BACK.")
+        else: st.warning("The ingredient list was cut short; some items may be missing. Search again for the full list.")
+
+    # SPECULATIVE PREFETCH: most people keep every box checked, so start that recipe while they review
+    if list_core and st.session_state.recipe_data is None:
+        spec_key = recipe_key(st.session_state.dish_name, servings, vibe_mode, list_core + list_character, [])
+        slot = st.session_state.prefetch
+        if not slot or slot[0] != spec_key:
+            if slot: slot[1].cancel()
+            stored = store.recipes.get_recipe(st.session_state.dish_name, servings, persona(vibe_mode))
+            if stored:
+                # Warmed offline by pregen.py
+                st.session_state.prefetch = (spec_key, resolved(stored))
+            elif PREFETCH:
+                spec_prompt = recipe_prompt(st.session_state.dish_name, servings, list_core + list_character, [], vibe_mode)
+                st.session_state.prefetch = (spec_key, background.submit(robust_api_call, spec_prompt, "recipe", "prefetch"))
+            else:
+                st.session_state.prefetch = None
 
     st.divider()
     
@@ -337,6 +474,10 @@ if st.session_state.ingredients:
         st.caption("*(Uncheck if you are delulu)*")
         character_avail = [i for x, i in enumerate(list_character) if st.checkbox(str(i), True, key=f"ch_{x}")]
         character_missing = [i for i in list_character if i not in character_avail]
+        # Instant swaps for whatever was just unchecked, from the local substitution index
+        swaps = substitutes.index.cover(character_missing)
+        for item, sub in swaps.items():
+            st.caption(f"{'🔁 SUS SWAP' if vibe_mode else '🔁 Swap'} **{item}** → {', '.join(sub.options[:3])}")
 
     st.write("")
     
@@ -350,59 +491,43 @@ if st.session_state.ingredients:
             all_missing = character_missing
             confirmed = list_core + character_avail
             with st.spinner("Cooking..."):
-                
                 # --- DYNAMIC PROMPTING (THE BRAIN) ---
-                if vibe_mode:
-                    # GEN Z PERSONA
-                    final_prompt = f"""
-                    Act as 'Chef Z', a chaotic Gen Z food influencer.
-                    Dish: {st.session_state.dish_name} ({servings} servings).
-                    Context: Confirmed: {confirmed}. Missing: {all_missing}.
-                    
-                    MANDATORY SLANG TO USE:
-                    - Rizz (Flavor/Charisma)
-                    - No Cap (Truth)
-                    - Bussin (Tastes good)
-                    - Bet (Yes/Okay)
-                    - Glow-up (Cooking process)
-                    - Era (e.g., In my spicy era)
-                    - Serving (Plating)
-                    - Slaps (Good)
-                    - Sus (If missing ingredients)
-                    - Delulu (If user thinks they can cook without basics)
-                    - Ghosting (If flavor is missing)
-                    
-                    OUTPUT JSON:
-                    {{
-                        "meta": {{ "prep_time": "15m", "cook_time": "30m", "difficulty": "Medium" }},
-                        "pivot_strategy": "Explain strategy using slang (e.g. 'We are entering our savory era').",
-                        "ingredients_list": ["Item 1", "Item 2"],
-                        "steps": ["Step 1...", "Step 2..."],
-                        "chef_tip": "A savage pro tip (e.g. 'Don't be a simp for salt')."
-                    }}
-                    """
-                else:
-                    # MICHELIN PERSONA (DEFAULT)
-                    final_prompt = f"""
-                    Act as 'Sous', a Michelin-star home chef.
-                    Dish: {st.session_state.dish_name} ({servings} servings).
-                    Context: Confirmed: {confirmed}. Missing: {all_missing}.
-                    
-                    TONE: Professional, structured, encouraging.
-                    
-                    OUTPUT JSON:
-                    {{
-                        "meta": {{ "prep_time": "15 mins", "cook_time": "30 mins", "difficulty": "Medium" }},
-                        "pivot_strategy": "Explain pivot strategy clearly.",
-                        "ingredients_list": ["Item 1", "Item 2"],
-                        "steps": ["Step 1...", "Step 2..."],
-                        "chef_tip": "A professional tip."
-                    }}
-                    """
-
-                r_data = robust_api_call(final_prompt)
-                if isinstance(r_data, dict): st.session_state.recipe_data = r_data
-                else: st.error("System Overload.")
+                pivots = {item: sub.best for item, sub in swaps.items()}
+                final_prompt = recipe_prompt(st.session_state.dish_name, servings, confirmed, all_missing, vibe_mode, pivots)
+                r_data = None
+                # Reuse the speculative result if the selection is the one we guessed, otherwise drop it
+                slot = st.session_state.prefetch
+                full_key = recipe_key(st.session_state.dish_name, servings, vibe_mode, list_core + list_character, [])
+                if slot and slot[0] == recipe_key(st.session_state.dish_name, servings, vibe_mode, confirmed, all_missing):
+                    r_data = prefetched(slot[1])
+                elif slot and slot[0] == full_key and len(swaps) == len(all_missing) and slot[1].done():
+                    # Every missing item has a known swap and the full-pantry recipe is already here: rewrite it
+                    # instead of asking again. Not worth waiting for, since the rewrite may still fall back to the model
+                    base = prefetched(slot[1])
+                    if isinstance(base, dict):
+                        lead = "Sus swaps, no cap: " if vibe_mode else "Pantry pivot: "
+                        r_data = substitutes.swap_recipe(base, swaps.values(), lead + "; ".join(f"{k} → {v}" for k, v in pivots.items()) + ".")
+                        # None: a line the table can't rewrite cleanly, so the model writes the pivot below
+                        metrics.incr("substitutes.local" if r_data else "substitutes.fallback")
+                elif slot:
+                    slot[1].cancel()
+                st.session_state.prefetch = None
+
+                if not isinstance(r_data, dict):
+                    note, on_queue = queue_status(vibe_mode)
+                    if STREAMING:
+                        live = st.empty()
+                        def show_partial(partial):
+                            with live.container(): render_live_recipe(partial, vibe_mode)
+                        r_data = stream_api_call(final_prompt, show_partial, stage="recipe", on_queue=on_queue)
+                        live.empty()
+                    else:
+                        r_data = robust_api_call(final_prompt, stage="recipe", on_queue=on_queue)
+                    note.empty()
+                if isinstance(r_data, dict):
+                    st.session_state.recipe_data = Recipe(st.session_state.dish_name, r_data, servings)
+                    st.rerun()   # the recipe card lives outside this fragment
+                else: st.error(f"System Overload. Details: {r_data}")
 
     elif not list_core: 
         if vibe_mode:
@@ -414,74 +539,59 @@ if st.session_state.ingredients:
             st.error("💀 NAH. YOU NEED THE OGs. STOP BEING DELULU.")
         else:
             st.error("CRITICAL: Missing Core Ingredients.")
+    metrics.observe("rerun.dashboard", time.perf_counter() - fragment_started)
+
+if st.session_state.ingredients: dashboard(vibe_mode, servings)
 
 # RECIPE CARD
-if st.session_state.recipe_data:
+@st.fragment
+def recipe_card(vibe_mode):
     r = st.session_state.recipe_data
     st.divider()
-    st.markdown(f"## {st.session_state.dish_name.upper()}")
+    st.markdown(f"## {r.dish.upper()}")
     m1, m2, m3 = st.columns(3)
-    m1.metric("PREP", r['meta'].get('prep_time', '--'))
-    m2.metric("COOK", r['meta'].get('cook_time', '--'))
-    m3.metric("LEVEL", r['meta'].get('difficulty', '--'))
-    
-    pivot_msg = r.get('pivot_strategy', '')
-    show_strategy = True
-    if not pivot_msg or "full pantry" in pivot_msg.lower() or "no missing" in pivot_msg.lower(): show_strategy = False
-
-    if show_strategy:
+    m1.metric("PREP", r.meta.get('prep_time', '--'))
+    m2.metric("COOK", r.meta.get('cook_time', '--'))
+    m3.metric("LEVEL", r.meta.get('difficulty', '--'))
+    if r.partial:
+        if vibe_mode: st.warning("⚠️ THE RECIPE GOT CUT OFF. LATER STEPS MIGHT BE MISSING. GENERATE AGAIN FOR THE FULL LORE.")
+        else: st.warning("This recipe was cut short; later steps or the tip may be missing. Generate again for the full recipe.")
+
+    if r.show_strategy:
         with st.container(border=True):
             if vibe_mode: st.markdown(f"**VIBE CHECK**")
             else: st.markdown(f"**STRATEGY**")
-            st.info(pivot_msg)
+            st.info(r.pivot_strategy)
     
     c_ing, c_step = st.columns([1, 2])
     with c_ing:
         with st.container(border=True):
             if vibe_mode: st.markdown("**THE LOOT DROP**")
             else: st.markdown("**INVENTORY**")
-            for item in r.get('ingredients_list', []): st.markdown(f"- {item}")
+            for item in r.ingredients_list: st.markdown(f"- {item}")
                 
     with c_step:
         with st.container(border=True):
             if vibe_mode: st.markdown("**THE TUTORIAL**")
             else: st.markdown("**EXECUTION**")
-            for idx, step in enumerate(r.get('steps', [])):
-                clean_step = re.sub(r'^[\d\.\s\*\-]+', '', step)
-                st.markdown(f"**{idx+1}.** {clean_step}")
+            for idx, step in enumerate(r.steps):
+                st.markdown(f"**{idx+1}.** {step}")
             st.markdown("---")
-            if vibe_mode: st.caption(f"**CHEAT CODE:** {r.get('chef_tip', '')}")
-            else: st.caption(f"**SECRET:** {r.get('chef_tip', '')}")
+            if vibe_mode: st.caption(f"**CHEAT CODE:** {r.chef_tip}")
+            else: st.caption(f"**SECRET:** {r.chef_tip}")
             
             # AUDIO
-            speech_text = f"Recipe for {st.session_state.dish_name}. "
-            if show_strategy: speech_text += f"Strategy: {pivot_msg}. "
-            speech_text += "Instructions: "
-            for s in r.get('steps', []):
-                clean = re.sub(r'^[\d\.\s\*\-]+', '', s)
-                speech_text += f"{clean}. "
-            speak_text_button(speech_text, vibe_mode)
+            speak_text_button(r.speech_js, vibe_mode)
 
     st.write("")
     
-    share_text = f"DISH: {st.session_state.dish_name}\n\n"
-    if show_strategy: share_text += f"STRATEGY: {pivot_msg}\n\n"
-    share_text += "INGREDIENTS:\n"
-    for i in r.get('ingredients_list', []): share_text += f"- {i}\n"
-    share_text += "\nINSTRUCTIONS:\n"
-    for i, s in enumerate(r.get('steps', [])): 
-        clean_step = re.sub(r'^[\d\.\s\*\-]+', '', s)
-        share_text += f"{i+1}. {clean_step}\n"
-    share_text += f"\nSECRET: {r.get('chef_tip', '')}"
-    
     a1, a2 = st.columns(2)
     with a1:
-        encoded_wa = urllib.parse.quote(share_text)
         # Dynamic WA Button
         if vibe_mode:
-            st.markdown(f"""<a href="https://wa.me/?text={encoded_wa}" target="_blank" style="text-decoration: none;"><button style="width: 100%; background-color: #000; color: #00FF00; border: 2px solid #00FF00; box-shadow: 4px 4px 0px #00FF00; font-family: 'Space Mono'; padding: 10px; font-weight: 700; cursor: pointer; text-transform: uppercase;">💬 SPILL THE TEA (WA)</button></a>""", unsafe_allow_html=True)
+            st.markdown(f"""<a href="{r.wa_url}" target="_blank" style="text-decoration: none;"><button style="width: 100%; background-color: #000; color: #00FF00; border: 2px solid #00FF00; box-shadow: 4px 4px 0px #00FF00; font-family: 'Space Mono'; padding: 10px; font-weight: 700; cursor: pointer; text-transform: uppercase;">💬 SPILL THE TEA (WA)</button></a>""", unsafe_allow_html=True)
         else:
-            st.link_button("💬 Share Recipe on WhatsApp", f"https://wa.me/?text={encoded_wa}", use_container_width=True)
+            st.link_button("💬 Share Recipe on WhatsApp", r.wa_url, use_container_width=True)
         
     with a2:
         if st.button("🔄 Start New Dish", use_container_width=True):
@@ -490,7 +600,10 @@ if st.session_state.recipe_data:
             
     st.write("")
     st.markdown("### SAVE DATA")
-    copy_to_clipboard_button(share_text, vibe_mode)
+    copy_to_clipboard_button(r.copy_js, vibe_mode)
+
+if st.session_state.recipe_data: recipe_card(vibe_mode)
 
 # --- FOOTER ---
-st.markdown('<div class="footer">Powered by Gemini</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<div class="footer">Powered by Gemini</div>', unsafe_allow_html=True)
+metrics.observe("rerun", time.perf_counter() - rerun_started)
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+
+# Headless benchmark: drives app.py through streamlit.testing.v1.AppTest against fakegemini,
+# so numbers are reproducible without network access or an API key.
+#   python bench.py                       # 10 runs, writes bench_results/<timestamp>.json, compares to the previous file
+#   python bench.py --latency 1.5 --malformed 0.1 --errors 0.05 --env SOUS_STREAM=0
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Sous end to end against a fake Gemini backend.")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake time to first byte (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--chunk-size", type=int, default=40)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--malformed", type=float, default=0.0, help="fraction of truncated JSON responses")
+    parser.add_argument("--errors", type=float, default=0.0, help="fraction of calls failing with 503")
+    parser.add_argument("--stalls", type=float, default=0.0, help="fraction of calls that stall before the first byte")
+    parser.add_argument("--stall", type=float, default=5.0, help="length of a stall (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--review", type=float, default=0.0, help="seconds a user spends on the checklist before Generate")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE app setting, e.g. SOUS_PREFETCH=0 (repeatable)")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--out", default="bench_results")
+    parser.add_argument("--compare", help="result file to compare against (default: latest in --out)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    return parser.parse_args(argv)
+
+def summarize(values):
+    values = sorted(values)
+    if not values: return {}
+    return {"n": len(values), "median": statistics.median(values), "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+            "min": values[0], "max": values[-1]}
+
+def find_button(at, *labels):
+    for b in at.button:
+        if any(label in str(b.label) for label in labels): return b
+    raise LookupError(f"No button labelled {labels}")
+
+def checked(at):
+    assert not at.exception, at.exception[0].message
+    return at
+
+class Session:
+    def __init__(self):
+        from streamlit.testing.v1 import AppTest
+        self.at = checked(AppTest.from_file(APP, default_timeout=120).run())
+
+    def timed(self, action):
+        wall, cpu = time.perf_counter(), time.process_time()
+        action()
+        checked(self.at.run())
+        return time.perf_counter() - wall, time.process_time() - cpu
+
+    def submit(self, dish):
+        self.at.text_input[0].input(dish)
+        return self.timed(lambda: find_button(self.at, "Let's Cook", "LET'S COOK").click())
+
+    def toggle(self, index=-1):
+        box = self.at.checkbox[index]
+        return self.timed(lambda: box.set_value(not box.value))
+
+    def generate(self):
+        elapsed = self.timed(lambda: find_button(self.at, "Generate Chef's Recipe", "GENERATE RECIPE").click())
+        if not any(m.value.startswith("## ") for m in self.at.markdown): raise RuntimeError("recipe card did not render")
+        return elapsed
+
+def run(args):
+    results = {"submit_cold": [], "submit_warm": [], "toggle_wall": [], "toggle_cpu": [], "generate": [],
+               "generate_after_uncheck": [], "rerun_idle_cpu": [], "session_kb": []}
+    failures = {}
+    def flow(steps):
+        # Runs one session's steps in order; a step that fails (injected errors, salvage gone wrong)
+        # is counted and ends that session, since later steps depend on it
+        for name, step in steps:
+            try:
+                step()
+            except (AssertionError, LookupError, RuntimeError, IndexError):
+                failures[name] = failures.get(name, 0) + 1
+                return
+
+    for i in range(args.runs):
+        dish = f"Bench Dish {args.seed}-{i}"
+        s = Session()
+        flow([("submit_cold", lambda: results["submit_cold"].append(s.submit(dish)[0])),
+              ("rerun_idle_cpu", lambda: results["rerun_idle_cpu"].append(s.timed(lambda: None)[1])),
+              ("review", lambda: time.sleep(args.review)),
+              ("generate", lambda: results["generate"].append(s.generate()[0]))])
+
+        s2 = Session()
+        def toggle():
+            wall, cpu = s2.toggle()
+            results["toggle_wall"].append(wall)
+            results["toggle_cpu"].append(cpu)
+        flow([("submit_warm", lambda: results["submit_warm"].append(s2.submit(dish)[0])),
+              ("toggle", toggle),
+              ("generate_after_uncheck", lambda: results["generate_after_uncheck"].append(s2.generate()[0]))])
+
+    # Memory per session: allocations still held after a full submit + generate
+    tracemalloc.start()
+    for i in range(min(args.runs, 5)):
+        before = tracemalloc.take_snapshot()
+        s = Session()
+        flow([("memory", lambda: (s.submit(f"Bench Memory {args.seed}-{i}"), s.generate()))])
+        after = tracemalloc.take_snapshot()
+        results["session_kb"].append(sum(d.size_diff for d in after.compare_to(before, "filename")) / 1024)
+        del s
+    tracemalloc.stop()
+    return {k: summarize(v) for k, v in results.items()}, failures
+
+def latest(out, exclude):
+    files = sorted(f for f in os.listdir(out) if f.endswith(".json") and os.path.join(out, f) != exclude) if os.path.isdir(out) else []
+    return os.path.join(out, files[-1]) if files else None
+
+def compare(current, previous, threshold):
+    regressions = []
+    print(f"\n{'metric':<24}{'median':>12}{'previous':>12}{'change':>10}")
+    for name, stats in current.items():
+        if not stats: continue
+        old = previous.get(name, {}).get("median")
+        change = (stats["median"] - old) / old * 100 if old else None
+        flag = ""
+        if change is not None and change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24}{stats['median']:>12.4f}{old if old is not None else float('nan'):>12.4f}"
+              f"{(f'{change:+.1f}%' if change is not None else '--'):>10}{flag}")
+    return regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Settings are read at import time, so everything is configured before the app modules load
+    os.environ["SOUS_BACKEND"] = "fake"
+    os.environ["SOUS_CACHE_DIR"] = tempfile.mkdtemp(prefix="sous-bench-")
+    os.environ.pop("SOUS_METRICS_PORT", None)
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        os.environ[key] = value
+    sys.path.insert(0, os.path.dirname(APP))
+    import fakegemini
+    fakegemini.install(latency=args.latency, jitter=args.jitter, chunk_size=args.chunk_size, chunk_delay=args.chunk_delay,
+                       malformed_rate=args.malformed, error_rate=args.errors, stall_rate=args.stalls, stall=args.stall,
+                       seed=args.seed)
+
+    started = time.time()
+    stats, failures = run(args)
+    # App-side timings: AppTest always reruns the whole script, so the cost of a fragment-only
+    # rerun (what a checkbox costs in a real browser session) comes from the app's own metrics
+    from metrics import metrics
+    for row in metrics.summary():
+        if row["stage"].startswith("rerun"):
+            stats["app." + row["stage"]] = {"n": row["count"], "median": row["p50"], "p95": row["p95"]}
+    record = {"label": args.label, "timestamp": started, "duration": time.time() - started, "config": vars(args),
+              "upstream_calls": fakegemini.FakeGenerativeModel.calls, "failures": failures, "results": stats}
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, time.strftime("%Y%m%d-%H%M%S", time.localtime(started)) + (f"-{args.label}" if args.label else "") + ".json")
+    with open(path, "w") as f: json.dump(record, f, indent=2)
+    print(f"Wrote {path} ({record['upstream_calls']} upstream calls, {record['duration']:.1f}s)")
+    if failures: print("Failed steps: " + ", ".join(f"{k} x{v}" for k, v in sorted(failures.items())))
+
+    baseline = args.compare or latest(args.out, path)
+    if not baseline:
+        for name, s in stats.items():
+            if s: print(f"{name:<24}{s['median']:>12.4f}")
+        return 0
+    with open(baseline) as f: previous = json.load(f)["results"]
+    print(f"Compared with {baseline}")
+    return 1 if compare(stats, previous, args.threshold) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
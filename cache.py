@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# --- SETTINGS ---
+CACHE_DIR = os.getenv("SOUS_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sous_cache")
+CACHE_MAX = int(os.getenv("SOUS_CACHE_MAX", "5000"))
+CACHE_TTL = float(os.getenv("SOUS_CACHE_TTL", str(7 * 24 * 3600)))
+
+def normalize(text):
+    return " ".join(str(text).split()).lower()
+
+def make_key(stage, *parts):
+    # "Pad Thai " and "pad  thai" share an entry; the stage keeps prompts for different calls apart
+    raw = "|".join([stage] + [normalize(p) for p in parts])
+    return stage + ":" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# --- RESPONSE CACHE ---
+class ResponseCache:
+    # SQLite-backed so it is shared by every session and every worker process, and survives restarts
+    def __init__(self, path=None, max_entries=CACHE_MAX, ttl=CACHE_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "responses.db")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return json.loads(row[0])
+            if row: self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now))
+            excess = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)", (excess,))
+                self.evictions += excess
+
+    def stats(self):
+        with self.lock:
+            size = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": size,
+                "hit_rate": self.hits / total if total else 0.0}
+
+responses = ResponseCache()
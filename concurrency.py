@@ -0,0 +1,141 @@
+import time
+import threading
+from concurrent.futures import Future
+
+# --- RATE LIMITING ---
+class TokenBucket:
+    # `rate` requests per second on average, with bursts of up to `capacity`
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+# --- REQUEST COALESCING ---
+ABANDONED = object()   # what followers get when the leader never finished
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller runs fn,
+    # the rest wait for its result (or its exception) for up to `timeout` seconds.
+    # Only Exceptions are shared; if the leader is interrupted, a follower takes over.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.leaders = self.followers = 0
+
+    def do(self, key, fn, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = Future()
+                    self.leaders += 1
+                else:
+                    self.followers += 1
+            if leader: return self.lead(key, call, fn)
+            result = call.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            # The leader was interrupted (a Streamlit rerun or stop in its own session): try again, maybe as leader
+            if result is not ABANDONED: return result
+
+    def lead(self, key, call, fn):
+        try:
+            result = fn()
+        except Exception as e:
+            with self.lock: self.calls.pop(key, None)
+            call.set_exception(e)
+            raise
+        except BaseException:
+            # Control flow that belongs to the leader's session, not an answer for anyone else
+            with self.lock: self.calls.pop(key, None)
+            call.set_result(ABANDONED)
+            raise
+        with self.lock: self.calls.pop(key, None)
+        call.set_result(result)
+        return result
+
+    def in_flight(self):
+        with self.lock: return len(self.calls)
+
+# --- ADMISSION CONTROL ---
+class Overloaded(Exception):
+    pass
+
+class QueueTimeout(Exception):
+    pass
+
+class PriorityGate:
+    # At most `limit` callers inside at once; the rest wait in priority order (lower first, FIFO within a class).
+    # Callers run their own work once admitted, so streaming callbacks stay on the session's thread.
+    # Lower classes are shed earlier: class p is turned away once `max_queue >> p` callers are waiting,
+    # and timeout=0 means "only if there is room right now".
+    def __init__(self, limit, max_queue):
+        self.limit, self.max_queue = limit, max_queue
+        self.cond = threading.Condition()
+        self.active = 0
+        self.waiting = []
+        self.seq = 0
+        self.admitted = self.queued = self.shed = self.timeouts = 0
+
+    def position(self, ticket):
+        return sum(1 for t in self.waiting if t < ticket)
+
+    def acquire(self, priority=0, timeout=None, on_wait=None):
+        # -> seconds spent queued; raises Overloaded (queue too deep) or QueueTimeout (waited too long)
+        started = time.monotonic()
+        with self.cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return 0.0
+            if timeout == 0 or len(self.waiting) >= max(1, self.max_queue >> priority):
+                self.shed += 1
+                raise Overloaded(f"queue full, {len(self.waiting)} waiting")
+            self.seq += 1
+            ticket = (priority, self.seq)
+            self.waiting.append(ticket)
+            self.queued += 1
+        shown = None
+        while True:
+            with self.cond:
+                if self.active < self.limit and min(self.waiting) == ticket:
+                    self.waiting.remove(ticket)
+                    self.active += 1
+                    self.admitted += 1
+                    self.cond.notify_all()
+                    return time.monotonic() - started
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                if remaining is not None and remaining <= 0:
+                    self.waiting.remove(ticket)
+                    self.timeouts += 1
+                    self.cond.notify_all()
+                    raise QueueTimeout(f"still queued after {timeout:.0f}s")
+                ahead = self.position(ticket)
+                if on_wait is None or ahead == shown: self.cond.wait(0.25 if remaining is None else min(remaining, 0.25))
+            if on_wait is not None and ahead != shown:
+                shown = ahead
+                on_wait(ahead)
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {"active": self.active, "waiting": len(self.waiting), "admitted": self.admitted,
+                    "queued": self.queued, "shed": self.shed, "timeouts": self.timeouts}
@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+from cache import CACHE_DIR
+from store import GLOBAL_DISHES, recipes
+
+# --- SETTINGS ---
+CATALOG_PATH = os.getenv("SOUS_DISHES") or os.path.join(CACHE_DIR, "dishes.db")
+MATCH_THRESHOLD = float(os.getenv("SOUS_DISH_MATCH", "0.6"))   # trigram Dice score needed for a fuzzy match
+WORD_MATCH = float(os.getenv("SOUS_DISH_WORD_MATCH", "0.8"))   # how alike two words must be to count as a typo
+PROMOTE = int(os.getenv("SOUS_DISH_PROMOTE", "3"))             # times a new dish is cooked before others see it
+
+# --- NORMALIZATION ---
+# "Spaghetti Carbonara " and "spaghetti carbonara recipe" share one key, so they share one
+# cache entry, one store row and one prompt. Generic carriers ("pasta", "noodle") stay in the key:
+# "Chicken Noodle Soup" is not "Chicken Soup". The catalog only lets one carrier stand in for another.
+FILLER = {"recipe", "recipes", "homemade", "easy", "quick", "classic", "authentic", "traditional", "best", "simple",
+          "the", "a", "an", "my", "style", "how", "to", "make", "cook", "some", "i", "want", "please", "with", "and"}
+GENERIC = {"pasta", "spaghetti", "noodle", "dish", "bowl", "plate"}
+
+def singular(word):
+    if word.endswith("ies") and len(word) > 4: return word[:-3] + "y"
+    if word.endswith("oes") and len(word) > 4: return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3: return word[:-1]
+    return word
+
+def tokens(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower().replace("&", " and ")
+    return [singular(w) for w in re.findall(r"[a-z0-9]+", text) if w not in FILLER]
+
+def dish_key(text):
+    # Word order and filler don't change which dish it is
+    return " ".join(sorted(set(tokens(text))))
+
+def carrier_key(key):
+    # "carbonara spaghetti" -> "carbonara": the key without its generic carriers, or None if it has none
+    # (or is nothing but carriers)
+    words = key.split()
+    core = [w for w in words if w not in GENERIC]
+    return " ".join(core) if core and len(core) < len(words) else None
+
+def same_words(a, b):
+    # Typos only: both keys have the same words, each at most a few letters off ("chiken curry" ~ "chicken curry").
+    # "chicken pad thai" is not "pad thai", and "10" is not "12"
+    left, right = a.split(), b.split()
+    if len(left) != len(right): return False
+    for word in left:
+        alike = [w for w in right if w == word or not word.isdigit() and SequenceMatcher(None, w, word).ratio() >= WORD_MATCH]
+        if not alike: return False
+        right.remove(alike[0])
+    return True
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# --- CATALOG ---
+class DishCatalog:
+    # Known dishes by canonical key: the seeds (GLOBAL_DISHES and the pre-generated store), plus dishes people
+    # cooked at least PROMOTE times. Lookups stay in memory (exact key, then a trigram index for typos);
+    # SQLite only keeps the counts across restarts.
+    def __init__(self, path=CATALOG_PATH, seeds=GLOBAL_DISHES):
+        self.lock = threading.Lock()
+        self.names = {}      # key -> display name
+        self.hits = {}       # key -> times asked for
+        self.postings = {}   # trigram -> {key}
+        self.sizes = {}      # key -> trigram count
+        self.pending = {}    # key -> [name, hits] for dishes not cooked often enough to be shown
+        self.carriers = {}   # carrier_key -> key, for known dishes served on a generic carrier
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS dishes (key TEXT PRIMARY KEY, name TEXT, hits INTEGER, added REAL)")
+        for name in seeds: self.index(dish_key(name), name, 0)
+        for name, hits in self.db.execute("SELECT name, hits FROM dishes ORDER BY hits DESC"):
+            key = dish_key(name)   # rows saved under an older key scheme come back under the current one
+            if key in self.names or hits >= PROMOTE and self.match(key)[0] is None: self.index(key, name, hits)
+            elif key: self.pending[key] = [name, hits]
+
+    def index(self, key, name, hits):
+        if not key: return
+        if key not in self.names:
+            self.names[key] = name
+            grams = trigrams(key)
+            self.sizes[key] = len(grams)
+            for t in grams: self.postings.setdefault(t, set()).add(key)
+            if carrier_key(key): self.carriers.setdefault(carrier_key(key), key)
+        self.hits[key] = max(self.hits.get(key, 0), hits)
+
+    def match(self, text):
+        # -> (key, score) of the closest known dish, or (None, best score) below the threshold
+        key = dish_key(text)
+        if not key: return None, 0.0
+        if key in self.names: return key, 1.0
+        # One carrier for another ("carbonara pasta" ~ "Spaghetti Carbonara"), never one dropped or added
+        if carrier_key(key) in self.carriers: return self.carriers[carrier_key(key)], 1.0
+        grams = trigrams(key)
+        shared = {}
+        with self.lock:
+            for t in grams:
+                for k in self.postings.get(t, ()): shared[k] = shared.get(k, 0) + 1
+        best, score = None, 0.0
+        for k, n in shared.items():
+            dice = 2 * n / (len(grams) + self.sizes[k])
+            if dice > score and same_words(key, k): best, score = k, dice
+        return (best, score) if score >= MATCH_THRESHOLD else (None, score)
+
+    def canonical(self, text):
+        # The display name to use for `text`: a known dish if it is one (or a typo of one), else the input tidied up
+        key, _ = self.match(text)
+        if key: return self.names[key]
+        return " ".join(str(text).split())
+
+    def add(self, name):
+        # Called once a dish produced a breakdown; a new dish joins the catalog after PROMOTE of these,
+        # so one person's typo never becomes everyone's suggestion or spelling
+        key = dish_key(name)
+        if not key: return
+        with self.lock:
+            if key in self.names:
+                self.hits[key] += 1
+                hits, name = self.hits[key], self.names[key]
+            else:
+                entry = self.pending.setdefault(key, [" ".join(str(name).split()), 0])
+                entry[1] += 1
+                hits, name = entry[1], entry[0]
+        if key not in self.names and hits >= PROMOTE and self.match(key)[0] is None:
+            with self.lock:
+                self.pending.pop(key, None)
+                self.index(key, name, hits)
+        try:
+            self.db.execute("INSERT INTO dishes VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET hits = excluded.hits",
+                            (key, name, hits, time.time()))
+        except sqlite3.Error:
+            pass
+
+    def suggestions(self, limit=200):
+        with self.lock:
+            ranked = sorted(self.names, key=lambda k: (-self.hits.get(k, 0), self.names[k]))
+            return [self.names[k] for k in ranked[:limit]]
+
+catalog = DishCatalog(seeds=GLOBAL_DISHES + recipes.dishes())   # plus whatever pregen.py warmed
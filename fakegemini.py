@@ -0,0 +1,112 @@
+import google.generativeai as genai
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+from google.api_core import exceptions as gexc
+
+# Local stand-in for genai.GenerativeModel: no network, no API key, reproducible.
+#   fakegemini.install(latency=0.8, malformed_rate=0.1)   # before the app makes any call
+#   SOUS_BACKEND=fake streamlit run app.py                # same thing for manual testing
+
+CONFIG = {
+    "latency": 0.5,          # seconds before the first byte
+    "jitter": 0.2,           # +/- uniform jitter on latency
+    "chunk_size": 40,        # characters per streamed chunk
+    "chunk_delay": 0.02,     # seconds between streamed chunks
+    "malformed_rate": 0.0,   # fraction of responses truncated mid-JSON
+    "error_rate": 0.0,       # fraction of calls raising 503 ServiceUnavailable
+    "stall_rate": 0.0,       # fraction of calls that stall before the first byte...
+    "stall": 5.0,            # ...for this many extra seconds
+    "steps": 8,
+    "seed": 0,
+}
+MODELS = ["models/gemini-1.5-flash", "models/gemini-1.5-pro"]
+
+def dish_of(prompt):
+    match = re.search(r"Dish:\s*(.+?)\s*(?:\(| for \d)", prompt)
+    return match.group(1) if match else "Mystery Dish"
+
+def breakdown(dish):
+    return {"core": [f"{dish} base", "Olive oil", "Onion", "Garlic"], "character": ["Black pepper", "Fresh basil", "Chili flakes"]}
+
+def recipe(dish, steps):
+    return {
+        "meta": {"prep_time": "15 mins", "cook_time": "30 mins", "difficulty": "Medium"},
+        "pivot_strategy": "Full pantry. No pivot needed.",
+        "ingredients_list": ["200g " + dish.lower(), "2 tbsp olive oil", "1 onion, diced", "3 cloves garlic", "1/2 tsp chili flakes", "1 handful fresh basil"],
+        "steps": [f"{i + 1}. Step {i + 1} for {dish}: keep going until it looks right." for i in range(steps)],
+        "chef_tip": "Season as you go.",
+    }
+
+def respond(prompt, generation_config):
+    schema = (generation_config or {}).get("response_schema") or {}
+    props = schema.get("properties", {}) if isinstance(schema, dict) else {}
+    dish = dish_of(prompt)
+    if "recipe" in props or "Task 2" in prompt:
+        return dict(breakdown(dish), recipe=recipe(dish, CONFIG["steps"]))
+    if "core" in props or ("core" in prompt and "steps" not in prompt):
+        return breakdown(dish)
+    return recipe(dish, CONFIG["steps"])
+
+class FakeStream:
+    def __init__(self, text, usage):
+        self.text_chunks = [text[i:i + CONFIG["chunk_size"]] for i in range(0, len(text), CONFIG["chunk_size"])]
+        self.usage_metadata = usage
+
+    def __iter__(self):
+        for i, piece in enumerate(self.text_chunks):
+            if i: time.sleep(CONFIG["chunk_delay"])
+            yield SimpleNamespace(text=piece)
+
+class FakeGenerativeModel:
+    calls = 0
+    lock = threading.Lock()
+    seen = {}
+
+    def __init__(self, model_name="models/gemini-1.5-flash", system_instruction=None, **kwargs):
+        self.model_name = model_name if "/" in model_name else "models/" + model_name
+        self.system_instruction = system_instruction
+
+    def rng(self, prompt):
+        # Seeded per (prompt, nth call with that prompt) so thread interleaving doesn't change outcomes
+        with FakeGenerativeModel.lock:
+            FakeGenerativeModel.calls += 1
+            n = FakeGenerativeModel.seen[prompt] = FakeGenerativeModel.seen.get(prompt, 0) + 1
+        digest = hashlib.sha1(f"{CONFIG['seed']}|{self.model_name}|{prompt}|{n}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None, **kwargs):
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        rng = self.rng(prompt)
+        delay = CONFIG["latency"] + rng.uniform(-CONFIG["jitter"], CONFIG["jitter"])
+        if rng.random() < CONFIG["stall_rate"]: delay += CONFIG["stall"]
+        time.sleep(max(0.0, delay))
+        if rng.random() < CONFIG["error_rate"]: raise gexc.ServiceUnavailable("fake backend: injected 503")
+        text = json.dumps(respond(prompt, generation_config))
+        if rng.random() < CONFIG["malformed_rate"]: text = text[:rng.randint(len(text) // 3, len(text) - 2)]
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        if stream: return FakeStream(text, usage)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def count_tokens(self, contents, **kwargs):
+        text = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        return SimpleNamespace(total_tokens=len(text) // 4)
+
+def list_models():
+    return [SimpleNamespace(name=n, supported_generation_methods=["generateContent", "countTokens"]) for n in MODELS]
+
+def install(**config):
+    CONFIG.update(config)
+    if genai.GenerativeModel is FakeGenerativeModel: return
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.list_models = list_models
+    genai.configure = lambda **kwargs: None
+    try:
+        import gemini
+        gemini.registry.models.clear()
+    except ImportError:
+        pass
@@ -0,0 +1,492 @@
+import google.generativeai as genai
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait, TimeoutError as FuturesTimeout
+from google.api_core import exceptions as gexc
+from cache import CACHE_DIR, normalize
+from concurrency import SingleFlight, PriorityGate, Overloaded, QueueTimeout
+from metrics import metrics
+from jsonstream import IncrementalJSONParser, Partial
+
+# --- SETTINGS ---
+MODEL_TTL = float(os.getenv("SOUS_MODEL_TTL", "21600"))   # re-discover every 6h
+MODEL_RETRY = 60                                          # back off this long after a failed discovery
+DEFAULT_MODEL = "models/gemini-1.5-flash"
+EMPTY_MODEL = "models/gemini-pro"
+
+def full_name(name):
+    return name if "/" in name else "models/" + name
+
+# --- MODEL DISCOVERY ---
+def rank_models(models):
+    # Flash first, then Pro, then whatever else can generate content
+    names = [m.name for m in models if 'generateContent' in m.supported_generation_methods]
+    flash = [n for n in names if 'flash' in n.lower()]
+    pro = [n for n in names if 'pro' in n.lower() and n not in flash]
+    return flash + pro + [n for n in names if n not in flash and n not in pro]
+
+class ModelRegistry:
+    # Process-wide: every Streamlit session shares one resolved list, refreshed in the background
+    def __init__(self, path=None, ttl=MODEL_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "models.json")
+        self.ttl = ttl
+        self.names = []
+        self.resolved_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.discovering = threading.Lock()
+        self.models = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f: saved = json.load(f)
+            if saved.get("names"):
+                self.names, self.resolved_at = saved["names"], float(saved.get("resolved_at", 0))
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f: json.dump({"names": self.names, "resolved_at": self.resolved_at}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def refresh(self):
+        try:
+            with metrics.timer("discovery") as fields:
+                fields["ok"] = False
+                names = rank_models(genai.list_models()) or [EMPTY_MODEL]
+                fields["ok"], fields["models"] = True, len(names)
+            with self.lock:
+                self.names, self.resolved_at = names, time.time()
+                self.save()
+        except Exception:
+            with self.lock:
+                if not self.names: self.names = [DEFAULT_MODEL]
+                self.resolved_at = time.time() - self.ttl + MODEL_RETRY
+        finally:
+            self.refreshing = False
+
+    def candidates(self):
+        override = os.getenv("SOUS_MODEL")
+        if override: return [full_name(override)]
+        with self.lock:
+            if not self.names: self.load()
+            cold = not self.names
+            stale = time.time() - self.resolved_at > self.ttl
+            if stale and not cold and not self.refreshing:
+                self.refreshing = True
+                threading.Thread(target=self.refresh, daemon=True).start()
+        if cold:
+            # Nothing on disk yet: the first caller pays for discovery once, the rest wait on it
+            with self.discovering:
+                if not self.names: self.refresh()
+        return list(self.names)
+
+    def get(self, name=None, system=None):
+        # One client per (model, system instruction), so each persona's instruction is set up once
+        name = name or self.candidates()[0]
+        key = (name, system)
+        if key not in self.models:
+            self.models[key] = genai.GenerativeModel(name, system_instruction=system) if system else genai.GenerativeModel(name)
+        return self.models[key]
+
+registry = ModelRegistry()
+
+# --- BACKGROUND WORK ---
+# Shared by every session for speculative calls; kept small so it can never starve live requests
+background = ThreadPoolExecutor(max_workers=int(os.getenv("SOUS_BACKGROUND_WORKERS", "4")), thread_name_prefix="sous-bg")
+
+def resolved(value):
+    # A finished Future, for results we already have but that are consumed like background work
+    future = Future()
+    future.set_result(value)
+    return future
+
+def get_working_model(system=None):
+    return registry.get(None, system)
+
+# --- RESPONSE SCHEMAS ---
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+SCHEMAS = {
+    "breakdown": {
+        "type": "object",
+        "properties": {"core": STRING_LIST, "character": STRING_LIST},
+        "required": ["core", "character"],
+    },
+    "recipe": {
+        "type": "object",
+        "properties": {
+            "meta": {
+                "type": "object",
+                "properties": {"prep_time": {"type": "string"}, "cook_time": {"type": "string"}, "difficulty": {"type": "string"}},
+                "required": ["prep_time", "cook_time", "difficulty"],
+            },
+            "pivot_strategy": {"type": "string"},
+            "ingredients_list": STRING_LIST,
+            "steps": STRING_LIST,
+            "chef_tip": {"type": "string"},
+        },
+        "required": ["meta", "pivot_strategy", "ingredients_list", "steps", "chef_tip"],
+    },
+}
+SCHEMAS["express"] = {
+    "type": "object",
+    "properties": dict(SCHEMAS["breakdown"]["properties"], recipe=SCHEMAS["recipe"]),
+    "required": ["core", "character", "recipe"],
+}
+SCHEMAS["rescale"] = {"type": "object", "properties": {"items": STRING_LIST}, "required": ["items"]}
+
+# Output tokens drive latency and cost, so every stage gets a ceiling (SOUS_MAX_OUTPUT_<STAGE> to override).
+# A response cut off at the ceiling is salvaged like any truncated JSON and comes back as a Partial;
+# truncated.<stage> counts them, so watch it in the admin view before lowering a ceiling.
+MAX_OUTPUT = {stage: int(os.getenv(f"SOUS_MAX_OUTPUT_{stage.upper()}", default))
+              for stage, default in (("breakdown", 512), ("recipe", 1536), ("express", 2048), ("rescale", 384))}
+# Gemini 2.5+ models think by default and count those tokens against max_output_tokens. This SDK has no
+# thinking_config to turn that off, so their ceilings get this much on top of the answer's own budget.
+THINKING_HEADROOM = int(os.getenv("SOUS_THINKING_HEADROOM", "1024"))
+
+def thinks(model_name):
+    match = re.search(r"gemini-(\d+(?:\.\d+)?)", model_name or "")
+    return bool(match) and float(match.group(1)) >= 2.5
+
+def generation_config(stage, schema=True, model_name=None):
+    config = {"response_mime_type": "application/json"}
+    if stage in MAX_OUTPUT: config["max_output_tokens"] = MAX_OUTPUT[stage] + (THINKING_HEADROOM if thinks(model_name) else 0)
+    if schema and stage in SCHEMAS: config["response_schema"] = SCHEMAS[stage]
+    return config
+
+# --- CALL LAYER ---
+RETRIES = int(os.getenv("SOUS_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("SOUS_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("SOUS_BACKOFF_MAX", "8"))
+CALL_TIMEOUT = float(os.getenv("SOUS_CALL_TIMEOUT", "30"))
+FLIGHT_TIMEOUT = float(os.getenv("SOUS_FLIGHT_TIMEOUT", "120"))
+
+MAX_INFLIGHT = int(os.getenv("SOUS_MAX_INFLIGHT", "8"))       # upstream calls running at once, across all sessions
+MAX_QUEUE = int(os.getenv("SOUS_MAX_QUEUE", "32"))             # waiting calls before new ones are shed
+QUEUE_TIMEOUT = float(os.getenv("SOUS_QUEUE_TIMEOUT", "20"))   # longest a call waits for a slot
+
+# Hedging: a call still running past the stage's recent p95 gets a duplicate on the next model, first valid answer wins
+HEDGE = os.getenv("SOUS_HEDGE", "1") == "1"
+HEDGE_QUANTILE = float(os.getenv("SOUS_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("SOUS_HEDGE_MIN_DELAY", "1.0"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("SOUS_HEDGE_DEFAULT_DELAY", "4.0"))   # until there are enough samples
+HEDGE_BUDGET = float(os.getenv("SOUS_HEDGE_BUDGET", "0.05"))               # hedges as a share of all calls
+
+# Lower goes first. Speculative prefetches never queue: they run if there's room or not at all.
+PRIORITY = {"recipe": 0, "rescale": 0, "breakdown": 1, "express": 1, "surprise": 2, "prefetch": 3}
+QUEUE_WAIT = {"prefetch": 0.0}
+
+TRANSIENT = (gexc.TooManyRequests, gexc.ServiceUnavailable, gexc.InternalServerError, gexc.DeadlineExceeded,
+             gexc.GatewayTimeout, gexc.BadGateway, TimeoutError, ConnectionError)
+
+class CallError:
+    # Returned (not raised) so callers keep the `isinstance(data, dict)` check; str() is the user-facing detail
+    def __init__(self, kind, message, stage=None, attempts=1):
+        self.kind, self.message, self.stage, self.attempts = kind, message, stage, attempts
+
+    def __str__(self):
+        return f"{self.kind}: {self.message}"
+
+    def __repr__(self):
+        return f"CallError({self.kind!r}, {self.message!r}, stage={self.stage!r}, attempts={self.attempts})"
+
+def classify(e):
+    if isinstance(e, (gexc.TooManyRequests, gexc.ResourceExhausted)): return "rate_limit"
+    if isinstance(e, (gexc.DeadlineExceeded, gexc.GatewayTimeout, TimeoutError)): return "timeout"
+    if isinstance(e, TRANSIENT): return "unavailable"
+    if isinstance(e, gexc.InvalidArgument): return "invalid_request"
+    if isinstance(e, (gexc.PermissionDenied, gexc.Unauthenticated)): return "auth"
+    return "error"
+
+class CallStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def incr(self, name, n=1):
+        with self.lock: self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock: return dict(self.counts)
+
+call_stats = CallStats()
+
+def backoff(attempt):
+    # Full jitter: spreads retries from many sessions instead of having them hit the API in lockstep
+    time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+def salvage_json(text):
+    # Recover what we can from truncated or wrapped output without another round trip;
+    # a Partial when the object never closed
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    if parser.done and isinstance(parser.value, dict): return parser.value
+    return Partial(parser.partial) if parser.partial else None
+
+def cut_off(response):
+    # True when the model stopped at max_output_tokens (thinking included), not because it was done
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return getattr(reason, "name", str(reason)).upper().endswith("MAX_TOKENS")
+
+def complete(data):
+    # A full answer: safe to cache, store or reuse. A Partial is only good for showing once
+    return isinstance(data, dict) and not isinstance(data, Partial)
+
+def usage(response, model=None, prompt=None, stage=None):
+    meta = getattr(response, "usage_metadata", None)
+    counts = {"prompt_tokens": getattr(meta, "prompt_token_count", 0) or 0,
+              "output_tokens": getattr(meta, "candidates_token_count", 0) or 0,
+              "thinking_tokens": getattr(meta, "thoughts_token_count", 0) or 0}
+    if not counts["prompt_tokens"] and model is not None:
+        # No usage metadata (some streamed responses): count the prompt later, not on the session's thread
+        # while it still holds an upstream slot; the event just records that the count is missing
+        counts["prompt_tokens_missing"] = True
+        background.submit(count_prompt, model, prompt, stage)
+    return counts
+
+def count_prompt(model, prompt, stage):
+    # System instruction included, since the model was built with it
+    try:
+        metrics.incr(f"tokens.{stage}.prompt", model.count_tokens(prompt).total_tokens)
+    except Exception:
+        call_stats.incr("errors.count_tokens")
+
+def parse_response(response, stage, info):
+    with metrics.timer("parse", stage=stage):
+        try:
+            text = response.text
+        except ValueError as e:
+            # No text parts: the candidate was blocked, or spent its whole budget (e.g. thinking) before answering
+            if cut_off(response): return CallError("truncated", "Hit the output limit before writing anything.", stage)
+            return CallError("blocked", str(e), stage)
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict): return data
+        except ValueError:
+            pass
+        data = salvage_json(text)
+        if data:
+            call_stats.incr("salvaged")
+            info["salvaged"] = True
+            if isinstance(data, Partial): info["partial"] = True
+            return data
+        return CallError("invalid_response", "Model returned no usable JSON.", stage)
+
+# Optional rate limiter (anything with .acquire()) charged once per request actually sent upstream:
+# first attempts, retries, schema fallbacks and hedges alike. pregen.py sets it to its --rate bucket.
+request_limiter = None
+
+def with_retries(stage, send):
+    # Runs send(use_schema) with bounded exponential backoff on transient errors.
+    # A model that rejects response_schema gets one fallback attempt with plain JSON mode.
+    # Returns (result or CallError, info) where info records what it took to get there.
+    call_stats.incr("calls")
+    info = {"attempts": 1, "retries": 0, "fallback": False}
+    use_schema = True
+    while True:
+        if request_limiter is not None: request_limiter.acquire()
+        try:
+            return send(use_schema), info
+        except Exception as e:
+            kind = classify(e)
+            if kind == "invalid_request" and use_schema:
+                call_stats.incr("fallbacks")
+                info["fallback"], use_schema = True, False
+                info["attempts"] += 1
+                continue
+            if isinstance(e, TRANSIENT) and info["retries"] < RETRIES:
+                call_stats.incr("retries")
+                backoff(info["retries"])
+                info["retries"] += 1
+                info["attempts"] += 1
+                continue
+            call_stats.incr("errors." + kind)
+            return CallError(kind, str(e), stage, info["attempts"]), info
+
+def record_call(model, stage, started, result, info):
+    info.update(stage=stage, model=model.model_name, ok=isinstance(result, dict))
+    if isinstance(result, CallError): info["error"] = result.kind
+    metrics.observe("api." + stage, time.perf_counter() - started, **info)
+    metrics.incr(f"tokens.{stage}.prompt", info.get("prompt_tokens", 0))
+    metrics.incr(f"tokens.{stage}.output", info.get("output_tokens", 0))
+    metrics.incr(f"tokens.{stage}.thinking", info.get("thinking_tokens", 0))
+    if info.get("partial") or info.get("error") == "truncated" or info.get("output_tokens", 0) >= MAX_OUTPUT.get(stage, float("inf")):
+        call_stats.incr(f"truncated.{stage}")
+
+# Identical prompts from concurrent sessions (a trending dish) share one upstream call
+flight = SingleFlight()
+
+def flight_key(model, prompt, stage):
+    raw = json.dumps([model.model_name, getattr(prompt, "system", None), normalize(prompt), generation_config(stage, model_name=model.model_name)], sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def coalesced(model, prompt, stage, fn):
+    try:
+        return flight.do(flight_key(model, prompt, stage), fn, FLIGHT_TIMEOUT)
+    except FuturesTimeout:
+        call_stats.incr("errors.timeout")
+        return CallError("timeout", f"Gave up waiting on an identical in-flight request after {FLIGHT_TIMEOUT:.0f}s.", stage)
+
+# Every upstream call takes a slot here, so a burst of sessions queues instead of tripping rate limits together
+upstream = PriorityGate(MAX_INFLIGHT, MAX_QUEUE)
+
+def admitted(stage, priority, on_queue, fn):
+    # priority: a PRIORITY class, defaulting to the stage's; on_queue(ahead) is called while waiting for a slot.
+    # fn(hand_off) runs holding the slot; hand_off(future) passes it to a request that may outlive fn,
+    # and the slot is released when that future finishes instead
+    priority = priority or stage
+    try:
+        waited = upstream.acquire(PRIORITY.get(priority, 1), QUEUE_WAIT.get(priority, QUEUE_TIMEOUT), on_queue)
+    except Overloaded as e:
+        call_stats.incr("errors.overloaded")
+        return CallError("overloaded", f"The kitchen is slammed ({e}). Try again in a moment.", stage)
+    except QueueTimeout as e:
+        call_stats.incr("errors.queue_timeout")
+        return CallError("queue_timeout", f"Waited too long for a free slot ({e}).", stage)
+    if waited: metrics.observe("queue.wait", waited, stage=stage, priority=priority)
+    handed = []
+    def hand_off(future):
+        handed.append(future)
+        future.add_done_callback(lambda f: upstream.release())
+    try:
+        return fn(hand_off)
+    finally:
+        if not handed: upstream.release()
+
+def robust_api_call(prompt, stage="recipe", priority=None, on_queue=None):
+    model = get_working_model(getattr(prompt, "system", None))
+    if HEDGE: send = lambda hand_off: hedged_call(model, prompt, stage, hand_off)
+    else: send = lambda hand_off: call_model(model, prompt, stage)
+    return coalesced(model, prompt, stage, lambda: admitted(stage, priority, on_queue, send))
+
+# --- HEDGING ---
+hedging = ThreadPoolExecutor(max_workers=2 * MAX_INFLIGHT, thread_name_prefix="sous-hedge")
+
+def hedge_delay(stage):
+    p = metrics.percentile("api." + stage, HEDGE_QUANTILE)
+    return HEDGE_DEFAULT_DELAY if p is None else max(HEDGE_MIN_DELAY, p)
+
+def hedge_model(model, system=None):
+    # The next eligible model (Flash -> Pro), or another attempt on the same one if it's all we have
+    for name in registry.candidates():
+        if name != model.model_name: return registry.get(name, system)
+    return model
+
+def hedged_call(model, prompt, stage, hand_off):
+    # The primary keeps the caller's gate slot until it finishes, even if the hedge wins and we return first
+    primary = hedging.submit(call_model, model, prompt, stage)
+    hand_off(primary)
+    try:
+        return primary.result(hedge_delay(stage))
+    except FuturesTimeout:
+        pass
+    counts = call_stats.snapshot()
+    # Losers still running are extra upstream load just like the hedges that left them behind
+    if counts.get("hedges", 0) + counts.get("hedge_orphans", 0) >= HEDGE_BUDGET * counts.get("calls", 0):
+        call_stats.incr("hedges_skipped")
+        return primary.result()
+    try:
+        upstream.acquire(0, 0)   # the duplicate needs its own slot, and never queues for one
+    except Overloaded:
+        call_stats.incr("hedges_skipped")
+        return primary.result()
+    call_stats.incr("hedges")
+    def backup():
+        try:
+            return call_model(hedge_model(model, getattr(prompt, "system", None)), prompt, stage)
+        finally:
+            upstream.release()
+    futures = {primary: "primary", hedging.submit(backup): "hedge"}
+    pending, first_error = set(futures), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if isinstance(result, dict):
+                call_stats.incr(f"hedge_wins.{futures[future]}")
+                # The SDK can't abort a request in flight: the loser runs out its own timeout, holding its slot
+                for other in pending:
+                    if other.cancel(): continue
+                    call_stats.incr("hedge_orphans")
+                    other.add_done_callback(lambda f: call_stats.incr("hedge_orphans", -1))
+                return result
+            first_error = first_error or result
+    return first_error
+
+def call_model(model, prompt, stage):
+    started = time.perf_counter()
+    def send(use_schema):
+        return model.generate_content(prompt, generation_config=generation_config(stage, use_schema, model.model_name),
+                                      request_options={"timeout": CALL_TIMEOUT})
+    response, info = with_retries(stage, send)
+    if isinstance(response, CallError):
+        result = response
+    else:
+        info.update(usage(response, model, prompt, stage))
+        result = parse_response(response, stage, info)
+        if isinstance(result, CallError):
+            result.attempts = info["attempts"]
+            call_stats.incr("errors." + result.kind)
+    record_call(model, stage, started, result, info)
+    return result
+
+def chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+def stream_api_call(prompt, on_update, stage="recipe", priority=None, on_queue=None):
+    # Same contract as robust_api_call, but hands each newly completed field to on_update as it arrives.
+    # Callers that join someone else's identical stream just get the final result.
+    model = get_working_model(getattr(prompt, "system", None))
+    return coalesced(model, prompt, stage, lambda: admitted(stage, priority, on_queue, lambda hand_off: stream_model(model, prompt, on_update, stage)))
+
+def stream_model(model, prompt, on_update, stage):
+    started = time.perf_counter()
+    parser = response = None
+    def send(use_schema):
+        nonlocal parser, response
+        parser = IncrementalJSONParser()   # a retry after a broken stream starts over cleanly
+        response = model.generate_content(prompt, generation_config=generation_config(stage, use_schema, model.model_name),
+                                          request_options={"timeout": CALL_TIMEOUT}, stream=True)
+        for chunk in response:
+            if parser.feed(chunk_text(chunk)):
+                if "first_field" not in info: info["first_field"] = round(time.perf_counter() - started, 4)
+                on_update(parser.partial)
+        return parser
+    info = {}
+    result, retry_info = with_retries(stage, send)
+    info.update(retry_info, stream=True)
+    if not isinstance(result, CallError):
+        info.update(usage(response, model, prompt, stage))
+        if parser.done and isinstance(parser.value, dict):
+            result = parser.value
+        elif parser.partial:
+            # Truncated (e.g. hit the token limit): keep every field that did complete, marked as such
+            call_stats.incr("salvaged")
+            info["salvaged"] = info["partial"] = True
+            result = Partial(parser.partial)
+        else:
+            kind = "truncated" if cut_off(response) else "invalid_response"
+            call_stats.incr("errors." + kind)
+            result = CallError(kind, "Model returned no usable JSON.", stage, info["attempts"])
+    record_call(model, stage, started, result, info)
+    return result
+
+metrics.register("calls", call_stats.snapshot)
+metrics.register("upstream", upstream.stats)
+metrics.register("flight", lambda: {"leaders": flight.leaders, "followers": flight.followers, "in_flight": flight.in_flight()})
@@ -0,0 +1,83 @@
+import json
+
+# --- INCREMENTAL JSON ---
+# Scans a JSON object as it streams in and reports each top-level field, and each
+# element of a top-level array, the moment its closing character arrives.
+#   parser = IncrementalJSONParser()
+#   for chunk in stream: events = parser.feed(chunk)   # [("field", "meta", {...}), ("item", "steps", 0, "..."), ...]
+#   parser.partial -> everything completed so far; parser.value -> full object once parser.done
+
+class Partial(dict):
+    # The fields of an object that was cut off before it closed (e.g. at the output token limit).
+    # Still a dict, so it can be shown; callers must not cache, store or reuse it as a complete answer.
+    pass
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.stack = []           # open containers: [kind, start, key, items, expecting_key]
+        self.in_str = False
+        self.esc = False
+        self.str_start = 0
+        self.scalar_start = None
+        self.started = False
+        self.done = False
+        self.value = None
+        self.partial = {}
+
+    def feed(self, chunk):
+        events = []
+        self.buf += chunk or ""
+        while self.pos < len(self.buf) and not self.done:
+            i, c = self.pos, self.buf[self.pos]
+            self.pos += 1
+            if self.in_str:
+                if self.esc: self.esc = False
+                elif c == "\\": self.esc = True
+                elif c == '"':
+                    self.in_str = False
+                    frame = self.stack[-1] if self.stack else None
+                    if frame and frame[0] == "{" and frame[4]: frame[2] = json.loads(self.buf[self.str_start:i + 1])
+                    else: self.close_value(self.str_start, i + 1, events)
+                continue
+            if not self.started:
+                # Skip anything (code fences, chatter) before the opening brace
+                if c == "{": self.started = True
+                else: continue
+            if c in " \t\r\n,:}]" and self.scalar_start is not None:
+                self.close_value(self.scalar_start, i, events)
+                self.scalar_start = None
+            if c == '"':
+                self.in_str, self.str_start = True, i
+            elif c in "{[":
+                self.stack.append([c, i, None, 0, c == "{"])
+            elif c in "}]":
+                if not self.stack: break
+                frame = self.stack.pop()
+                self.close_value(frame[1], i + 1, events)
+            elif c == ":":
+                if self.stack: self.stack[-1][4] = False
+            elif c == ",":
+                if self.stack and self.stack[-1][0] == "{": self.stack[-1][4] = True
+            elif c not in " \t\r\n" and self.scalar_start is None:
+                self.scalar_start = i
+        return events
+
+    def close_value(self, start, end, events):
+        try:
+            value = json.loads(self.buf[start:end])
+        except ValueError:
+            return
+        depth = len(self.stack)
+        if depth == 0:
+            self.done, self.value = True, value
+        elif depth == 1 and self.stack[0][0] == "{":
+            key = self.stack[0][2]
+            self.partial[key] = value
+            events.append(("field", key, value))
+        elif depth == 2 and self.stack[0][0] == "{" and self.stack[1][0] == "[":
+            key, index = self.stack[0][2], self.stack[1][3]
+            self.stack[1][3] += 1
+            self.partial.setdefault(key, []).append(value)
+            events.append(("item", key, index, value))
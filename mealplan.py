@@ -0,0 +1,111 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cache
+import store
+from dishes import catalog
+from gemini import robust_api_call, complete
+from prompts import breakdown_prompt
+from recipe import Ingredients
+from substitutes import ALIASES, normalize, singular
+
+# --- SETTINGS ---
+PLAN_MAX = int(os.getenv("SOUS_PLAN_MAX", "14"))            # dishes per plan
+PLAN_WORKERS = int(os.getenv("SOUS_PLAN_WORKERS", "6"))     # breakdowns in flight per plan; the upstream gate still applies
+
+def parse_dishes(text):
+    # One per line or comma-separated; canonical names, repeats of the same name ("carbonara" twice) dropped
+    seen, dishes = set(), []
+    for raw in re.split(r"[\n,;]+", text or ""):
+        if not raw.strip(): continue
+        name = catalog.canonical(raw)
+        key = cache.normalize(name)
+        if key and key not in seen:
+            seen.add(key)
+            dishes.append(name)
+    return dishes[:PLAN_MAX]
+
+def fetch_breakdown(dish, servings):
+    # Same sources as a single dish: the pre-generated store, the response cache, then the model
+    cache_key = cache.make_key("breakdown", dish, servings)
+    data = store.recipes.get_breakdown(dish, servings) or cache.responses.get(cache_key)
+    if data is None:
+        data = robust_api_call(breakdown_prompt(dish, servings), stage="breakdown")
+        if complete(data): cache.responses.put(cache_key, data)
+    return data
+
+def breakdowns(dishes, servings):
+    # Yields (dish, data or CallError) in completion order. Breakdowns run side by side on a pool of the plan's own,
+    # so a week of dinners costs about one call's latency and never waits behind someone else's plan
+    pool = ThreadPoolExecutor(max_workers=max(1, min(PLAN_WORKERS, len(dishes))), thread_name_prefix="sous-plan")
+    try:
+        futures = {pool.submit(fetch_breakdown, dish, servings): dish for dish in dishes}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # A rerun that abandons the plan drops what hasn't started instead of waiting for it
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# --- SHOPPING LIST ---
+def item_key(name):
+    # The normalized, singular words; only explicit aliases ("Cilantro" for coriander) merge different names
+    words = normalize(name)
+    key = " ".join(singular(w) for w in words.split())
+    return ALIASES.get(words) or ALIASES.get(key) or key or str(name).strip().lower()
+
+class ShoppingItem:
+    __slots__ = ("name", "core", "dishes")
+
+    def __init__(self, name, core):
+        self.name, self.core, self.dishes = name, core, []
+
+class ShoppingList:
+    # Hash-indexed by item_key, so merging N dishes is one pass over their ingredients
+    def __init__(self):
+        self.items = {}
+
+    def add(self, dish, ingredients):
+        for names, core in ((ingredients.core, True), (ingredients.character, False)):
+            for name in names:
+                key = item_key(name)
+                item = self.items.get(key)
+                if item is None: item = self.items[key] = ShoppingItem(name, core)
+                item.core = item.core or core   # a must-have anywhere is a must-have on the list
+                if dish not in item.dishes: item.dishes.append(dish)
+
+    def sections(self):
+        # -> (core items, character items), most-shared first
+        ranked = sorted(self.items.values(), key=lambda i: (-len(i.dishes), i.name.lower()))
+        return [i for i in ranked if i.core], [i for i in ranked if not i.core]
+
+    def __len__(self):
+        return len(self.items)
+
+class MealPlan:
+    def __init__(self, dishes, servings):
+        self.dishes, self.servings = dishes, servings
+        self.ingredients = {}   # dish -> Ingredients, in completion order
+        self.errors = {}        # dish -> error detail
+        self.partial = []       # dishes whose breakdown was cut short
+        self.shopping = ShoppingList()
+
+    def add(self, dish, data):
+        if not isinstance(data, dict):
+            self.errors[dish] = str(data)
+            return
+        ingredients = Ingredients.from_response(data)
+        if ingredients.partial: self.partial.append(dish)
+        self.ingredients[dish] = ingredients
+        self.shopping.add(dish, ingredients)
+        catalog.add(dish)
+
+    @property
+    def done(self):
+        return len(self.ingredients) + len(self.errors) == len(self.dishes)
+
+    def text(self):
+        core, character = self.shopping.sections()
+        lines = [f"MEAL PLAN ({self.servings} servings each): " + ", ".join(self.dishes), "", "MUST HAVE:"]
+        lines += [f"- {i.name}" for i in core]
+        lines += ["", "FLAVOR:"] + [f"- {i.name}" for i in character]
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+import os
+import json
+import atexit
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cache import CACHE_DIR
+
+# --- SETTINGS ---
+METRICS_DIR = os.getenv("SOUS_METRICS_DIR") or os.path.join(CACHE_DIR, "metrics")
+METRICS_WINDOW = int(os.getenv("SOUS_METRICS_WINDOW", "2000"))   # samples kept per stage for quantiles
+EXPORT_EVERY = float(os.getenv("SOUS_METRICS_EXPORT_EVERY", "10"))
+LOG_BUFFER = int(os.getenv("SOUS_METRICS_LOG_BUFFER", "200"))              # events held before a write
+LOG_FLUSH_EVERY = float(os.getenv("SOUS_METRICS_LOG_FLUSH_EVERY", "5"))    # ...or seconds since the last one
+LOG_MAX_BYTES = int(os.getenv("SOUS_METRICS_LOG_MAX", str(10 * 1024 * 1024)))   # then events.jsonl rolls to .1
+QUANTILES = (0.5, 0.95, 0.99)
+
+def quantile(values, q):
+    # Nearest-rank on a sorted list
+    if not values: return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+# --- METRICS ---
+class Metrics:
+    # Per-stage latency samples, token/event counters, a JSONL event log and a Prometheus text file.
+    # Other modules register counter sources (e.g. cache stats) that are read at export time.
+    def __init__(self, path=METRICS_DIR, window=METRICS_WINDOW):
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.totals = {}
+        self.counters = {}
+        self.sources = {}
+        self.exported_at = 0.0
+        self.buffer = []                       # serialized events not yet written
+        self.buffer_lock = threading.Lock()    # both apart from self.lock, so a slow disk never blocks observe()
+        self.file_lock = threading.Lock()
+        self.flushed_at = time.time()
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            pass
+        atexit.register(self.flush)
+
+    def observe(self, metric, seconds, **fields):
+        with self.lock:
+            self.samples.setdefault(metric, deque(maxlen=self.window)).append(seconds)
+            count, total = self.totals.get(metric, (0, 0.0))
+            self.totals[metric] = (count + 1, total + seconds)
+        self.log(dict(fields, metric=metric, seconds=round(seconds, 6)))
+        if time.time() - self.exported_at > EXPORT_EVERY: self.export()
+
+    def incr(self, name, n=1):
+        with self.lock: self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, metric, **fields):
+        # with metrics.timer("parse", stage="recipe") as f: ... f["ok"] = True
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.observe(metric, time.perf_counter() - started, **fields)
+
+    def register(self, name, source):
+        # source() -> {counter: number}
+        self.sources[name] = source
+
+    def log(self, event):
+        event["ts"] = round(time.time(), 3)
+        line = json.dumps(event, default=str)
+        with self.buffer_lock:
+            self.buffer.append(line)
+            due = len(self.buffer) >= LOG_BUFFER or time.time() - self.flushed_at > LOG_FLUSH_EVERY
+        if due: self.flush()
+
+    def flush(self):
+        # One append per batch; past LOG_MAX_BYTES the file rolls over to events.jsonl.1 (one generation kept)
+        with self.buffer_lock:
+            lines, self.buffer = self.buffer, []
+            self.flushed_at = time.time()
+        if not lines: return
+        path = os.path.join(self.path, "events.jsonl")
+        try:
+            with self.file_lock:
+                if os.path.exists(path) and os.path.getsize(path) > LOG_MAX_BYTES: os.replace(path, path + ".1")
+                with open(path, "a") as f: f.write("\n".join(lines) + "\n")
+        except OSError:
+            pass
+
+    def summary(self):
+        with self.lock:
+            stages = {k: (sorted(v), self.totals[k]) for k, v in self.samples.items()}
+        rows = []
+        for stage, (values, (count, total)) in sorted(stages.items()):
+            row = {"stage": stage, "count": count, "mean": total / count if count else 0.0}
+            for q in QUANTILES: row[f"p{int(q * 100)}"] = quantile(values, q)
+            rows.append(row)
+        return rows
+
+    def percentile(self, metric, q, min_samples=20):
+        # None until there are enough samples to trust, so callers can fall back to a fixed value
+        with self.lock:
+            values = sorted(self.samples.get(metric, ()))
+        return quantile(values, q) if len(values) >= min_samples else None
+
+    def source_values(self):
+        values = {}
+        for name, source in list(self.sources.items()):
+            try:
+                values[name] = {k: v for k, v in source().items() if isinstance(v, (int, float))}
+            except Exception:
+                pass
+        return values
+
+    def prometheus(self):
+        lines = ["# TYPE sous_stage_seconds summary"]
+        for row in self.summary():
+            for q in QUANTILES:
+                lines.append(f'sous_stage_seconds{{stage="{row["stage"]}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'sous_stage_seconds_count{{stage="{row["stage"]}"}} {row["count"]}')
+            lines.append(f'sous_stage_seconds_sum{{stage="{row["stage"]}"}} {row["mean"] * row["count"]:.6f}')
+        lines.append("# TYPE sous_events_total counter")
+        with self.lock: counters = dict(self.counters)
+        for name, value in sorted(counters.items()):
+            lines.append(f'sous_events_total{{name="{name}"}} {value}')
+        lines.append("# TYPE sous_source gauge")
+        for source, values in sorted(self.source_values().items()):
+            for name, value in sorted(values.items()):
+                lines.append(f'sous_source{{source="{source}",name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        self.exported_at = time.time()
+        try:
+            tmp = os.path.join(self.path, "metrics.prom.tmp")
+            with open(tmp, "w") as f: f.write(self.prometheus())
+            os.replace(tmp, os.path.join(self.path, "metrics.prom"))
+        except OSError:
+            pass
+
+    def serve(self, port):
+        # Optional scrape endpoint: GET /metrics on its own daemon thread
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *args):
+                pass
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        except OSError:
+            return None   # already bound, e.g. after Streamlit reloaded this module
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+metrics = Metrics()
+if os.getenv("SOUS_METRICS_PORT"): metrics.serve(int(os.getenv("SOUS_METRICS_PORT")))
@@ -0,0 +1,97 @@
+import os
+# Before gemini is imported: a batch job has no tail latency worth duplicating requests for
+os.environ.setdefault("SOUS_HEDGE", "0")
+import google.generativeai as genai
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from concurrency import TokenBucket
+import gemini
+from gemini import robust_api_call, complete
+from prompts import breakdown_prompt, recipe_prompt, PERSONAS
+from recipe import Ingredients
+from store import RecipeStore, GLOBAL_DISHES, STORE_PATH
+
+# Offline warm-up: pre-generates breakdowns and both persona recipes into the recipe store
+#   python pregen.py                          # GLOBAL_DISHES at 2 servings
+#   python pregen.py -f dishes.txt -s 2 4 -w 8 --rate 2
+
+def read_dishes(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def warm(dish, servings, store):
+    # Everything one (dish, servings) needs; skips whatever the store already has so reruns resume
+    out = {"breakdowns": [], "recipes": [], "errors": []}
+    data = store.get_breakdown(dish, servings)
+    if data is None:
+        data = robust_api_call(breakdown_prompt(dish, servings), stage="breakdown")
+        if not complete(data):
+            # The store never expires, so a cut-off breakdown is an error here, not a row
+            out["errors"].append(f"breakdown: {data if not isinstance(data, dict) else 'cut short'}")
+            return out
+        out["breakdowns"].append((dish, servings, data))
+    ingredients = Ingredients.from_response(data)
+    if not ingredients.core:
+        out["errors"].append("breakdown: no core ingredients")
+        return out
+    for name, is_vibe in PERSONAS.items():
+        if store.get_recipe(dish, servings, name) is not None: continue
+        r_data = robust_api_call(recipe_prompt(dish, servings, ingredients.all, [], is_vibe), stage="recipe")
+        if complete(r_data): out["recipes"].append((dish, servings, name, r_data))
+        else: out["errors"].append(f"{name}: {r_data if not isinstance(r_data, dict) else 'cut short'}")
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate Sous breakdowns and recipes into the local recipe store.")
+    parser.add_argument("-f", "--file", action="append", default=[], help="extra dish list, one per line (repeatable)")
+    parser.add_argument("--no-defaults", action="store_true", help="skip the built-in GLOBAL_DISHES")
+    parser.add_argument("-s", "--servings", type=int, nargs="+", default=[2])
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=2.0, help="max upstream requests per second")
+    parser.add_argument("--burst", type=float, default=None, help="token bucket capacity (default: rate)")
+    parser.add_argument("--batch", type=int, default=25, help="rows per bulk write")
+    parser.add_argument("--store", default=STORE_PATH)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("GOOGLE_API_KEY missing.", file=sys.stderr)
+        return 2
+    genai.configure(api_key=api_key)
+
+    dishes = [] if args.no_defaults else list(GLOBAL_DISHES)
+    for path in args.file: dishes += read_dishes(path)
+    dishes = list(dict.fromkeys(dishes))
+    jobs = [(d, s) for d in dishes for s in args.servings]
+
+    store = RecipeStore(args.store)
+    # Charged per upstream request inside the call layer, so retries and any hedges count against --rate too
+    gemini.request_limiter = TokenBucket(args.rate, args.burst)
+    pending = {"breakdowns": [], "recipes": []}
+    def flush():
+        if pending["breakdowns"]: store.put_breakdowns(pending["breakdowns"])
+        if pending["recipes"]: store.put_recipes(pending["recipes"])
+        pending["breakdowns"], pending["recipes"] = [], []
+
+    started, failed = time.time(), 0
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="sous-pregen") as pool:
+        futures = {pool.submit(warm, d, s, store): (d, s) for d, s in jobs}
+        for n, future in enumerate(as_completed(futures), 1):
+            dish, servings = futures[future]
+            out = future.result()
+            pending["breakdowns"] += out["breakdowns"]
+            pending["recipes"] += out["recipes"]
+            if len(pending["breakdowns"]) + len(pending["recipes"]) >= args.batch: flush()
+            status = "; ".join(out["errors"]) if out["errors"] else f"+{len(out['breakdowns'])} breakdown, +{len(out['recipes'])} recipes"
+            failed += bool(out["errors"])
+            print(f"[{n}/{len(jobs)}] {dish} x{servings}: {status}", flush=True)
+    flush()
+    print(f"Done in {time.time() - started:.1f}s, {len(jobs) - failed} ok, {failed} with errors.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
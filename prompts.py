@@ -0,0 +1,83 @@
+# --- PROMPTS ---
+# Shared by the live app and background work so both always ask the model the same question.
+# Templates are compacted before sending; what never changes for a persona goes in Prompt.system,
+# which gemini.py sends as the model's system_instruction instead of repeating it in every request.
+
+def compact(text):
+    # Indentation and blank lines are tokens too
+    return "\n".join(line.strip() for line in text.strip().splitlines() if line.strip())
+
+class Prompt(str):
+    # A prompt string that also carries its static system instruction (None for none)
+    def __new__(cls, text, system=None):
+        prompt = super().__new__(cls, compact(text))
+        prompt.system = compact(system) if system else None
+        return prompt
+
+RECIPE_JSON = '{"meta": {"prep_time": "15 mins", "cook_time": "30 mins", "difficulty": "Medium"}, "pivot_strategy": "...", "ingredients_list": ["Item 1", "Item 2"], "steps": ["Step 1...", "Step 2..."], "chef_tip": "..."}'
+
+PERSONA = {
+    # MICHELIN PERSONA (DEFAULT)
+    "sous": """
+        Act as 'Sous', a Michelin-star home chef.
+        TONE: Professional, structured, encouraging.
+        pivot_strategy: explain how the recipe adapts to missing ingredients, clearly. chef_tip: a professional tip.
+    """,
+    # GEN Z PERSONA
+    "chef_z": """
+        Act as 'Chef Z', a chaotic Gen Z food influencer.
+        MANDATORY SLANG: Rizz (flavor), No Cap (truth), Bussin (tastes good), Bet (okay), Glow-up (cooking process),
+        Era (e.g. in my spicy era), Serving (plating), Slaps (good), Sus (missing ingredients),
+        Delulu (cooking without basics), Ghosting (missing flavor).
+        pivot_strategy: the strategy in slang (e.g. 'We are entering our savory era'). chef_tip: a savage pro tip (e.g. 'Don't be a simp for salt').
+    """,
+}
+
+# Recipe requests answer with the recipe itself; express requests wrap it with the breakdown,
+# so their system text describes the recipe object without claiming it is the whole output
+SYSTEM = {name: text + f"OUTPUT JSON: {RECIPE_JSON}" for name, text in PERSONA.items()}
+EXPRESS_SYSTEM = {name: text + f"RECIPE OBJECT: {RECIPE_JSON}" for name, text in PERSONA.items()}
+
+def breakdown_prompt(dish, servings):
+    return Prompt(f"""
+        Dish: {dish} for {servings} people.
+        Task: Break down ingredients into exactly 2 categories.
+        RULES: 1. Core = Non-negotiables. 2. Character = Spices/Herbs. 3. No Nulls.
+        OUTPUT JSON ONLY: {{"core": ["Ing 1", "Ing 2"], "character": ["Ing 3", "Ing 4"]}}
+    """)
+
+def recipe_prompt(dish, servings, confirmed, missing, is_vibe, pivots=None):
+    # pivots: {missing item: suggested substitute} from the local substitution index
+    swaps = f"\nSuggested swaps: {'; '.join(f'{k} -> {v}' for k, v in pivots.items())}." if pivots else ""
+    return Prompt(f"""
+        Dish: {dish} ({servings} servings).
+        Confirmed: {confirmed}. Missing: {missing}.{swaps}
+    """, SYSTEM[persona(is_vibe)])
+
+def express_prompt(dish, servings, is_vibe):
+    # One round trip: the breakdown plus the recipe for the "nothing missing" case
+    return Prompt(f"""
+        Dish: {dish} for {servings} people.
+        Task 1: Break down ingredients into exactly 2 categories.
+        RULES: 1. Core = Non-negotiables. 2. Character = Spices/Herbs. 3. No Nulls.
+        Task 2: Write the full recipe, assuming every ingredient from Task 1 is available (nothing missing).
+        OUTPUT JSON ONLY: {{"core": [...], "character": [...], "recipe": {{...the RECIPE OBJECT...}}}}
+    """, EXPRESS_SYSTEM[persona(is_vibe)])
+
+def rescale_prompt(lines, old_servings, new_servings):
+    # Fallback for ingredient lines quantities.py couldn't scale on its own
+    return Prompt(f"""
+        Rescale these recipe ingredient lines from {old_servings} to {new_servings} servings.
+        Lines: {lines}
+        RULES: 1. Same order, same count. 2. Change only the amounts. 3. Use amounts a cook can measure.
+        OUTPUT JSON ONLY: {{"items": ["Line 1", "Line 2"]}}
+    """)
+
+PERSONAS = {"sous": False, "chef_z": True}
+
+def persona(is_vibe):
+    return "chef_z" if is_vibe else "sous"
+
+def recipe_key(dish, servings, is_vibe, confirmed, missing):
+    # Identifies one recipe request; two equal keys produce the same prompt
+    return (dish, servings, persona(is_vibe), tuple(confirmed), tuple(missing))
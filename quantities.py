@@ -0,0 +1,116 @@
+import re
+from fractions import Fraction
+
+# --- QUANTITY PARSING ---
+# Finds the amount in an ingredient line ("200g spaghetti", "1 1/2 cups flour", "2-3 cloves garlic",
+# "Eggs (2 large)", "½ tsp salt") so a recipe can be rescaled locally instead of regenerated.
+
+VULGAR = {"½": Fraction(1, 2), "⅓": Fraction(1, 3), "⅔": Fraction(2, 3), "¼": Fraction(1, 4), "¾": Fraction(3, 4),
+          "⅛": Fraction(1, 8), "⅜": Fraction(3, 8), "⅝": Fraction(5, 8), "⅞": Fraction(7, 8)}
+WORDS = {"half": Fraction(1, 2), "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+         "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "dozen": 12}
+METRIC = {"g", "gr", "gram", "grams", "kg", "mg", "ml", "l", "litre", "litres", "liter", "liters", "cl", "dl"}
+MEASURES = METRIC | {"cup", "cups", "tbsp", "tbs", "tablespoon", "tablespoons", "tsp", "teaspoon", "teaspoons",
+                     "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds", "pint", "pints", "quart", "quarts", "stick", "sticks"}
+COUNTS = {"clove", "cloves", "can", "cans", "tin", "tins", "slice", "slices", "sprig", "sprigs", "bunch", "bunches",
+          "piece", "pieces", "pinch", "pinches", "handful", "handfuls", "stalk", "stalks", "leaf", "leaves", "head", "heads"}
+PLURALS = {"cup": "cups", "clove": "cloves", "can": "cans", "tin": "tins", "slice": "slices", "sprig": "sprigs",
+           "bunch": "bunches", "piece": "pieces", "pinch": "pinches", "handful": "handfuls", "stalk": "stalks",
+           "head": "heads", "stick": "sticks", "pint": "pints", "quart": "quarts", "pound": "pounds", "ounce": "ounces",
+           "tablespoon": "tablespoons", "teaspoon": "teaspoons", "lb": "lbs", "leaf": "leaves"}
+SINGULARS = {v: k for k, v in PLURALS.items()}
+
+NUMBER = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?(?:\s?[½⅓⅔¼¾⅛⅜⅝⅞])?|[½⅓⅔¼¾⅛⅜⅝⅞])"
+UNIT = "|".join(sorted((re.escape(u) for u in MEASURES | COUNTS), key=len, reverse=True))
+MEASURE_UNIT = "|".join(sorted((re.escape(u) for u in MEASURES), key=len, reverse=True))
+QUANTITY = re.compile(rf"(?<![\w/.])(?P<low>{NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{NUMBER}))?(?:\s*(?P<unit>{UNIT})\b)?", re.IGNORECASE)
+MEASURED = re.compile(rf"(?<![\w/.])(?P<low>{NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{NUMBER}))?\s*(?P<unit>{MEASURE_UNIT})\b", re.IGNORECASE)
+NUMBER_WORDS = re.compile(r"\b(" + "|".join(w for w in WORDS if len(w) > 2) + r")\b", re.IGNORECASE)
+
+def to_fraction(text):
+    text = text.strip()
+    if text in VULGAR: return VULGAR[text]
+    if text[-1] in VULGAR: return Fraction(text[:-1].strip() or "0") + VULGAR[text[-1]]
+    if " " in text:
+        whole, frac = text.split(None, 1)
+        return Fraction(whole) + Fraction(frac)
+    return Fraction(text)
+
+class Quantity:
+    __slots__ = ("start", "end", "low", "high", "unit")
+
+    def __init__(self, start, end, low, high, unit):
+        self.start, self.end, self.low, self.high, self.unit = start, end, low, high, unit
+
+def plausible(line, match):
+    # Numbers that name rather than measure: "Type 00 flour", "5-spice", "2% milk"
+    if re.match(r"0\d", match.group("low")): return False
+    return not re.match(r"\s*%|-[^\W\d_]", line[match.end():])
+
+def to_quantity(match):
+    high = match.group("high")
+    return Quantity(match.start(), match.end(), to_fraction(match.group("low")), to_fraction(high) if high else None,
+                    match.group("unit") or "")
+
+def find_quantity(line):
+    # An amount with a measure ("500g", "1 tsp") wins wherever it is in the line; otherwise the first number,
+    # but only when every number in the line reads as an amount. None means "not sure", not "no amount".
+    for match in MEASURED.finditer(line):
+        if plausible(line, match): return to_quantity(match)
+    matches = list(QUANTITY.finditer(line))
+    if not matches or not all(plausible(line, m) for m in matches): return None
+    return to_quantity(matches[0])
+
+# --- FORMATTING ---
+def format_amount(value, unit):
+    if unit.lower() in METRIC:
+        # Metric: whole numbers, rounded to 5 once they are big enough for that not to matter
+        v = float(value)
+        if v < 10: return f"{v:.2f}".rstrip("0").rstrip(".")
+        if v < 100: return str(int(round(v)))
+        return str(int(5 * round(v / 5)))
+    # Everything else in quarters, written the way recipes write them
+    quarters = max(1, round(value * 4))
+    whole, rest = divmod(quarters, 4)
+    frac = {0: "", 1: "1/4", 2: "1/2", 3: "3/4"}[rest]
+    if whole and frac: return f"{whole} {frac}"
+    return str(whole) if whole else frac
+
+def format_unit(unit, value):
+    lowered = unit.lower()
+    if value > 1 and lowered in PLURALS: return PLURALS[lowered]
+    if value <= 1 and lowered in SINGULARS: return SINGULARS[lowered]
+    return unit
+
+def scale_span(line, q, factor):
+    original = line[q.start:q.end]
+    low = q.low * factor
+    text = format_amount(low, q.unit)
+    if q.high is not None: text += "-" + format_amount(q.high * factor, q.unit)
+    if q.unit:
+        # Keep "200g" as "300g" and "2 cups" as "3 cups"
+        spaced = original[:len(original) - len(q.unit)].endswith(" ")
+        text += (" " if spaced else "") + format_unit(q.unit, q.high * factor if q.high is not None else low)
+    return line[:q.start] + text + line[q.end:]
+
+# --- RESCALING ---
+def rescale_line(line, factor):
+    # -> (new_line, status) with status "scaled", "unscaled" (nothing to scale, e.g. "Salt to taste")
+    #    or "unparsed" (mentions an amount we can't read, e.g. "juice of half a lemon")
+    q = find_quantity(line)
+    if q: return scale_span(line, q, factor), "scaled"
+    if NUMBER_WORDS.search(line) or re.search(r"\d", line): return line, "unparsed"
+    return line, "unscaled"
+
+def rescale_text(text, factor):
+    # Free text (recipe steps): only amounts with an explicit measure, so "10 minutes" or "180C" stay put
+    out, pos = [], 0
+    for match in MEASURED.finditer(text):
+        if not plausible(text, match): continue
+        high = match.group("high")
+        q = Quantity(0, match.end() - match.start(), to_fraction(match.group("low")), to_fraction(high) if high else None, match.group("unit"))
+        out.append(text[pos:match.start()])
+        out.append(scale_span(match.group(0), q, factor))
+        pos = match.end()
+    out.append(text[pos:])
+    return "".join(out)
@@ -0,0 +1,126 @@
+import re
+import urllib.parse
+from fractions import Fraction
+from jsonstream import Partial
+from quantities import rescale_line, rescale_text
+
+# --- INGREDIENT LISTS ---
+def clean_list(raw_list):
+    clean_items = []
+    IGNORE_LIST = ["none", "null", "n/a", "undefined", "", "missing", "optional", "core", "character", "must_haves", "soul"]
+    if isinstance(raw_list, list):
+        for item in raw_list:
+            if isinstance(item, list): clean_items.extend(clean_list(item))
+            elif isinstance(item, str):
+                s = item.strip().replace("- ", "").replace("* ", "")
+                if len(s) > 2 and s.lower() not in IGNORE_LIST: clean_items.append(s)
+            elif isinstance(item, dict): clean_items.extend(clean_list(list(item.values())))
+    return clean_items
+
+def split_ingredients(data):
+    data_lower = {k.lower(): v for k, v in data.items()}
+    raw_core = data_lower.get('core') or data_lower.get('must_haves') or []
+    raw_char = data_lower.get('character') or data_lower.get('soul') or []
+    if not raw_core and not raw_char:
+        all_lists = [v for v in data.values() if isinstance(v, list)]
+        if len(all_lists) > 0: raw_core = all_lists[0]
+        if len(all_lists) > 1: raw_char = all_lists[1]
+    return clean_list(raw_core), clean_list(raw_char)
+
+
+class Ingredients:
+    # A breakdown response normalized once, whatever keys or nesting the model used
+    __slots__ = ("core", "character", "partial")
+
+    def __init__(self, core, character, partial=False):
+        self.core, self.character, self.partial = list(core), list(character), partial
+
+    @classmethod
+    def from_response(cls, data):
+        return cls(*split_ingredients(data), partial=isinstance(data, Partial))
+
+    @property
+    def all(self):
+        return self.core + self.character
+
+# --- RECIPE ---
+STEP_PREFIX = re.compile(r'^[\d\.\s\*\-]+')
+
+def clean_step(step):
+    return STEP_PREFIX.sub('', str(step))
+
+class Recipe:
+    # Built once when a response arrives; the renderings the card needs are computed on first use and kept
+    __slots__ = ("dish", "servings", "meta", "pivot_strategy", "show_strategy", "ingredients_list", "steps", "chef_tip",
+                 "partial", "_share_text", "_speech_text", "_wa_url", "_copy_js", "_speech_js")
+
+    def __init__(self, dish, data, servings=None):
+        meta = data.get('meta')
+        self.dish = dish
+        self.servings = servings
+        self.meta = meta if isinstance(meta, dict) else {}
+        self.pivot_strategy = str(data.get('pivot_strategy') or '')
+        lowered = self.pivot_strategy.lower()
+        self.show_strategy = bool(self.pivot_strategy) and "full pantry" not in lowered and "no missing" not in lowered
+        self.ingredients_list = tuple(str(i) for i in data.get('ingredients_list') or [])
+        self.steps = tuple(clean_step(s) for s in data.get('steps') or [])
+        self.chef_tip = str(data.get('chef_tip') or '')
+        self.partial = isinstance(data, Partial)   # the model was cut off: later steps or the tip may be missing
+        self._share_text = self._speech_text = self._wa_url = self._copy_js = self._speech_js = None
+
+    def to_dict(self):
+        return (Partial if self.partial else dict)(
+            meta=dict(self.meta), pivot_strategy=self.pivot_strategy, ingredients_list=list(self.ingredients_list),
+            steps=list(self.steps), chef_tip=self.chef_tip)
+
+    def rescaled(self, servings):
+        # -> (Recipe for `servings`, indices of ingredient lines whose amounts couldn't be read locally)
+        if not self.servings or servings == self.servings: return self, []
+        factor = Fraction(servings, self.servings)
+        data, unparsed = self.to_dict(), []
+        data["ingredients_list"] = []
+        for n, line in enumerate(self.ingredients_list):
+            line, status = rescale_line(line, factor)
+            if status == "unparsed": unparsed.append(n)
+            data["ingredients_list"].append(line)
+        data["steps"] = [rescale_text(step, factor) for step in self.steps]
+        return Recipe(self.dish, data, servings), unparsed
+
+    @property
+    def share_text(self):
+        if self._share_text is None:
+            parts = [f"DISH: {self.dish}\n\n"]
+            if self.show_strategy: parts.append(f"STRATEGY: {self.pivot_strategy}\n\n")
+            parts.append("INGREDIENTS:\n")
+            parts.extend(f"- {i}\n" for i in self.ingredients_list)
+            parts.append("\nINSTRUCTIONS:\n")
+            parts.extend(f"{n + 1}. {s}\n" for n, s in enumerate(self.steps))
+            parts.append(f"\nSECRET: {self.chef_tip}")
+            self._share_text = "".join(parts)
+        return self._share_text
+
+    @property
+    def speech_text(self):
+        if self._speech_text is None:
+            parts = [f"Recipe for {self.dish}. "]
+            if self.show_strategy: parts.append(f"Strategy: {self.pivot_strategy}. ")
+            parts.append("Instructions: ")
+            parts.extend(f"{s}. " for s in self.steps)
+            self._speech_text = "".join(parts)
+        return self._speech_text
+
+    @property
+    def wa_url(self):
+        if self._wa_url is None: self._wa_url = "https://wa.me/?text=" + urllib.parse.quote(self.share_text)
+        return self._wa_url
+
+    @property
+    def copy_js(self):
+        # share_text as the body of a double-quoted JS string
+        if self._copy_js is None: self._copy_js = self.share_text.replace("\n", "\\n").replace("\"", "\\\"")
+        return self._copy_js
+
+    @property
+    def speech_js(self):
+        if self._speech_js is None: self._speech_js = self.speech_text.replace("\n", " ").replace("\"", "'")
+        return self._speech_js
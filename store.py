@@ -0,0 +1,53 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from cache import CACHE_DIR, normalize
+
+GLOBAL_DISHES = ["Shakshuka", "Pad Thai", "Chicken Tikka Masala", "Beef Wellington", "Bibimbap", "Moussaka", "Paella", "Ramen", "Tacos"]
+STORE_PATH = os.getenv("SOUS_STORE") or os.path.join(CACHE_DIR, "recipes.db")
+
+# --- RECIPE STORE ---
+# Pre-generated breakdowns and full-pantry recipes (see pregen.py). Unlike the response cache
+# nothing here expires or gets evicted: it is the warm set the app serves before asking the model.
+class RecipeStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS breakdowns (dish TEXT, servings INTEGER, name TEXT, data TEXT, created REAL, PRIMARY KEY (dish, servings))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS recipes (dish TEXT, servings INTEGER, persona TEXT, data TEXT, created REAL, PRIMARY KEY (dish, servings, persona))")
+        self.db.commit()
+
+    def get_breakdown(self, dish, servings):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM breakdowns WHERE dish = ? AND servings = ?", (normalize(dish), servings)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_recipe(self, dish, servings, persona):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM recipes WHERE dish = ? AND servings = ? AND persona = ?", (normalize(dish), servings, persona)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_breakdowns(self, rows):
+        # rows: [(dish, servings, data)], written in one transaction
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO breakdowns VALUES (?, ?, ?, ?, ?)",
+                                [(normalize(d), s, d, json.dumps(data), now) for d, s, data in rows])
+
+    def put_recipes(self, rows):
+        # rows: [(dish, servings, persona, data)], written in one transaction
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO recipes VALUES (?, ?, ?, ?, ?)",
+                                [(normalize(d), s, p, json.dumps(data), now) for d, s, p, data in rows])
+
+    def dishes(self):
+        with self.lock:
+            return [r[0] for r in self.db.execute("SELECT DISTINCT name FROM breakdowns ORDER BY name")]
+
+recipes = RecipeStore()
@@ -0,0 +1,203 @@
+import re
+from quantities import find_quantity, MEASURES
+
+# --- SUBSTITUTION TABLE ---
+# Common pantry swaps, answered locally so unchecking an item doesn't need a model round trip.
+# canonical ingredient -> substitutes, best first
+SUBSTITUTES = {
+    "basil": ["oregano (dried, use a third)", "parsley", "mint", "spinach"],
+    "parsley": ["coriander", "chives", "basil", "celery leaves"],
+    "coriander": ["parsley", "basil", "mint"],
+    "mint": ["basil", "parsley"],
+    "thyme": ["oregano", "rosemary (use half)", "marjoram"],
+    "rosemary": ["thyme", "sage", "oregano"],
+    "oregano": ["thyme", "basil", "marjoram"],
+    "sage": ["thyme", "rosemary (use half)", "marjoram"],
+    "dill": ["fennel fronds", "tarragon", "parsley"],
+    "bay leaf": ["thyme (a pinch)", "oregano (a pinch)"],
+    "chili flakes": ["cayenne pepper (a pinch)", "hot sauce", "black pepper"],
+    "cayenne pepper": ["chili flakes", "paprika and a pinch of black pepper", "hot sauce"],
+    "chili": ["chili flakes", "cayenne pepper", "hot sauce"],
+    "paprika": ["chili powder (use half)", "cayenne pepper (a pinch)"],
+    "smoked paprika": ["paprika", "chipotle powder (use half)"],
+    "cumin": ["ground coriander", "chili powder", "garam masala"],
+    "garam masala": ["curry powder", "cumin and cinnamon"],
+    "curry powder": ["garam masala", "cumin and turmeric"],
+    "turmeric": ["curry powder", "saffron (a pinch)"],
+    "cinnamon": ["nutmeg (use a quarter)", "allspice", "mixed spice"],
+    "nutmeg": ["cinnamon", "mace", "allspice"],
+    "ginger": ["ground ginger (use a quarter)", "galangal", "allspice"],
+    "black pepper": ["white pepper", "chili flakes (a pinch)"],
+    "garlic": ["garlic powder (1/8 tsp per clove)", "shallot", "chives"],
+    "shallot": ["red onion", "onion", "leek"],
+    "onion": ["shallot", "leek", "onion powder (1 tbsp per onion)"],
+    "spring onion": ["chives", "leek", "shallot"],
+    "lemon": ["lime", "white wine vinegar (for acidity)", "orange"],
+    "lime": ["lemon", "rice vinegar (for acidity)"],
+    "lemon juice": ["lime juice", "white wine vinegar"],
+    "white wine": ["stock and a splash of vinegar", "dry vermouth", "apple cider vinegar (diluted)"],
+    "red wine": ["stock and a splash of balsamic", "grape juice and vinegar"],
+    "soy sauce": ["tamari", "coconut aminos", "worcestershire sauce"],
+    "fish sauce": ["soy sauce", "anchovy paste", "worcestershire sauce"],
+    "worcestershire sauce": ["soy sauce and vinegar", "fish sauce"],
+    "balsamic vinegar": ["red wine vinegar and a pinch of sugar", "sherry vinegar"],
+    "mirin": ["rice vinegar and sugar", "dry sherry"],
+    "parmesan": ["pecorino", "grana padano", "nutritional yeast"],
+    "pecorino": ["parmesan", "grana padano"],
+    "mozzarella": ["burrata", "provolone", "fontina"],
+    "feta": ["goat cheese", "ricotta salata", "halloumi"],
+    "cream": ["milk and butter", "creme fraiche", "greek yogurt (off the heat)"],
+    "sour cream": ["greek yogurt", "creme fraiche"],
+    "butter": ["olive oil", "ghee", "coconut oil"],
+    "olive oil": ["vegetable oil", "butter", "rapeseed oil"],
+    "sesame oil": ["toasted sesame seeds and oil", "peanut oil"],
+    "honey": ["maple syrup", "agave syrup", "brown sugar"],
+    "brown sugar": ["white sugar and molasses", "honey", "maple syrup"],
+    "breadcrumbs": ["crushed crackers", "panko", "rolled oats"],
+    "pine nuts": ["walnuts", "almonds", "sunflower seeds"],
+    "capers": ["chopped green olives", "chopped gherkins"],
+    "anchovies": ["fish sauce", "capers", "miso"],
+    "pancetta": ["bacon", "guanciale", "smoked ham"],
+    "guanciale": ["pancetta", "bacon"],
+    "chicken stock": ["vegetable stock", "water and a stock cube", "water and soy sauce"],
+    "vegetable stock": ["chicken stock", "water and a stock cube"],
+    "tomato paste": ["passata (reduced)", "ketchup (use half)"],
+    "coconut milk": ["cream", "greek yogurt and water"],
+    "vanilla extract": ["maple syrup", "vanilla sugar"],
+}
+
+# Other names for the same thing -> canonical key. Only these and the exact table names match:
+# "Peanut butter" is not butter and "Beef stock" is not chicken stock.
+ALIASES = {
+    "cilantro": "coriander", "fresh coriander": "coriander", "coriander leaves": "coriander",
+    "basil leaves": "basil", "mint leaves": "mint", "parsley leaves": "parsley", "flat leaf parsley": "parsley",
+    "italian parsley": "parsley", "sage leaves": "sage", "thyme leaves": "thyme", "rosemary leaves": "rosemary",
+    "red pepper flakes": "chili flakes", "chilli flakes": "chili flakes", "crushed red pepper": "chili flakes",
+    "chilli": "chili", "chile": "chili", "red chili": "chili", "green chili": "chili",
+    "scallion": "spring onion", "green onion": "spring onion",
+    "parmigiano reggiano": "parmesan", "parmigiano": "parmesan", "pecorino romano": "pecorino",
+    "heavy cream": "cream", "double cream": "cream", "single cream": "cream", "whipping cream": "cream",
+    "extra virgin olive oil": "olive oil", "evoo": "olive oil",
+    "chicken broth": "chicken stock", "vegetable broth": "vegetable stock", "stock": "chicken stock",
+    "tomato puree": "tomato paste", "lemon zest": "lemon", "lime juice": "lime",
+    "bay leaves": "bay leaf", "soya sauce": "soy sauce", "cayenne": "cayenne pepper",
+    "garlic cloves": "garlic", "garlic clove": "garlic", "panko breadcrumbs": "breadcrumbs", "dry white wine": "white wine",
+}
+
+# Words that describe how an ingredient is prepared rather than what it is. "ground", "dried" and
+# "whole" stay: ground coriander is a different ingredient from the fresh herb.
+DESCRIPTORS = {"fresh", "freshly", "chopped", "minced", "sliced", "diced", "grated", "crushed", "torn", "large",
+               "small", "medium", "ripe", "finely", "roughly", "optional", "good", "quality", "of", "sprigs", "sprig",
+               "bunch", "handful", "pinch", "to", "taste", "a", "some", "cracked"}
+
+def normalize(name):
+    # "Fresh Basil Leaves (torn)" -> "basil leaves"; keeps word order so multi-word keys still match
+    text = re.sub(r"\([^)]*\)", " ", str(name).lower())
+    text = re.sub(r"[^a-z\s]", " ", text)
+    words = [w for w in text.split() if w not in DESCRIPTORS]
+    return " ".join(words)
+
+def singular(word):
+    if word.endswith("ies") and len(word) > 4: return word[:-3] + "y"
+    if word.endswith("oes"): return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3: return word[:-1]
+    return word
+
+def ingredient_name(line):
+    # "2 tbsp chopped basil, to garnish" -> "chopped basil"
+    q = find_quantity(line)
+    rest = line[:q.start] + " " + line[q.end:] if q else line
+    rest = re.sub(r"\([^)]*\)", " ", rest).split(",")[0]
+    return " ".join(rest.split()).strip(" -–:;.")
+
+# --- INDEX ---
+class Substitution:
+    __slots__ = ("ingredient", "canonical", "options", "pattern")
+
+    def __init__(self, ingredient, canonical, options, pattern):
+        self.ingredient, self.canonical, self.options, self.pattern = ingredient, canonical, options, pattern
+
+    @property
+    def best(self):
+        return self.options[0]
+
+    @property
+    def swap(self):
+        # -> (name, note): "garlic powder (1/8 tsp per clove)" -> ("garlic powder", "1/8 tsp per clove")
+        match = re.match(r"(.*?)\s*\((.*)\)$", self.best)
+        return (match.group(1), match.group(2)) if match else (self.best, "")
+
+    def rewrite(self, line):
+        # One ingredient line, quantity included; None when there's no honest way to do it locally
+        name, note = self.swap
+        q = find_quantity(line)
+        if note:
+            # The note carries the amount: "garlic powder (1/8 tsp per clove, instead of 2 garlic cloves)"
+            return f"{name} ({note}, instead of {line.strip()})"
+        if q is None:
+            return None if re.search(r"\d", line) else self.pattern.sub(name, line, count=1)
+        if q.unit and q.unit.lower() not in MEASURES:
+            return None   # "3 sprigs thyme": a sprig of something else isn't the same amount
+        return f"{line[q.start:q.end]} {name}"
+
+class SubstitutionIndex:
+    # Exact lookup of the normalized name (or its singular) among table names and aliases
+    def __init__(self, table=SUBSTITUTES, aliases=ALIASES):
+        self.table = {k: tuple(v) for k, v in table.items()}
+        self.keys = {}
+        for name in list(table) + list(aliases):
+            canonical = aliases.get(name, name)
+            self.keys[normalize(name)] = canonical
+            self.keys[" ".join(singular(w) for w in normalize(name).split())] = canonical
+        names = {}
+        for name, canonical in self.keys.items(): names.setdefault(canonical, set()).add(name)
+        self.patterns = {
+            canonical: re.compile(r"\b(?:" + "|".join(re.escape(n).replace(r"\ ", r"\s+") + "s?" for n in sorted(ns, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+            for canonical, ns in names.items()
+        }
+        self.memo = {}
+
+    def canonical(self, name):
+        if name in self.memo: return self.memo[name]
+        words = normalize(name)
+        found = self.keys.get(words) or self.keys.get(" ".join(singular(w) for w in words.split()))
+        if len(self.memo) > 4096: self.memo.clear()
+        self.memo[name] = found
+        return found
+
+    def lookup(self, name):
+        canonical = self.canonical(name)
+        if canonical is None or canonical not in self.table: return None
+        return Substitution(name, canonical, self.table[canonical], self.patterns[canonical])
+
+    def cover(self, missing):
+        # -> {item: Substitution} for the items we can answer; compare its length with `missing` for full coverage
+        found = {}
+        for item in missing:
+            sub = self.lookup(item)
+            if sub: found[item] = sub
+        return found
+
+def swap_recipe(data, subs, pivot_strategy):
+    # A full-pantry recipe rewritten for the missing items without asking the model again,
+    # or None when any of it can't be done cleanly and the model should write the pivot
+    subs = list(subs)
+    missing = {sub.canonical for sub in subs}
+    lines, steps = [str(i) for i in data.get("ingredients_list") or []], [str(s) for s in data.get("steps") or []]
+    for sub in subs:
+        name, _ = sub.swap
+        if index.canonical(name) in missing: return None   # swapping one missing item for another
+        names = [ingredient_name(line) for line in lines]
+        hits = [n for n, item in enumerate(names) if index.canonical(item) == sub.canonical]
+        if not hits: return None
+        # Another ingredient containing this one ("peanut butter", "garlic powder") makes every mention ambiguous
+        if any(sub.pattern.search(item) for n, item in enumerate(names) if n not in hits): return None
+        for n in hits:
+            lines[n] = sub.rewrite(lines[n])
+            if lines[n] is None: return None
+        steps = [sub.pattern.sub(name, step) for step in steps]
+    out = dict(data)
+    out["ingredients_list"], out["steps"], out["pivot_strategy"] = lines, steps, pivot_strategy
+    return out
+
+index = SubstitutionIndex()
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The app modules live at the repo root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Caches and the dish catalog open their SQLite files on import; keep them out of the real cache dir
+os.environ.setdefault("SOUS_CACHE_DIR", tempfile.mkdtemp(prefix="sous-tests-"))
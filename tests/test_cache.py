@@ -0,0 +1,34 @@
+import pytest
+
+from cache import ResponseCache, make_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    return now
+
+def test_keys_ignore_case_and_spacing():
+    assert make_key("breakdown", "Pad Thai ", 2) == make_key("breakdown", "pad  thai", 2)
+    assert make_key("breakdown", "Pad Thai", 2) != make_key("recipe", "Pad Thai", 2)
+
+def test_ttl(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "r.db"), ttl=60)
+    cache.put("k", {"core": ["Rice"]})
+    clock[0] += 59
+    assert cache.get("k") == {"core": ["Rice"]}
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0   # expired rows go on read
+
+def test_lru_eviction(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "r.db"), max_entries=2)
+    cache.put("a", 1)
+    clock[0] += 1
+    cache.put("b", 2)
+    clock[0] += 1
+    cache.get("a")            # "b" is now the least recently used
+    clock[0] += 1
+    cache.put("c", 3)
+    assert [cache.get(k) for k in "abc"] == [1, None, 3]
+    assert cache.stats()["evictions"] == 1
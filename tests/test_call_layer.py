@@ -0,0 +1,75 @@
+import pytest
+from google.api_core import exceptions as gexc
+
+import fakegemini
+import gemini
+from gemini import CallError, Partial, call_model, with_retries
+from prompts import breakdown_prompt
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(gemini, "backoff", lambda attempt: None)
+
+def scripted(*outcomes):
+    # send(use_schema) that raises or returns each outcome in turn, recording the use_schema it got
+    calls = []
+    def send(use_schema):
+        calls.append(use_schema)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception): raise outcome
+        return outcome
+    return send, calls
+
+RETRIES = gemini.RETRIES
+
+@pytest.mark.parametrize("outcomes, kind, schemas", [
+    ([{"ok": 1}], None, [True]),
+    # A model that rejects response_schema gets one plain-JSON attempt, then the error stands
+    ([gexc.InvalidArgument("schema"), {"ok": 1}], None, [True, False]),
+    ([gexc.InvalidArgument("schema"), gexc.InvalidArgument("still")], "invalid_request", [True, False]),
+    # Transient errors are retried with backoff, up to RETRIES times
+    ([gexc.ServiceUnavailable("503"), gexc.ServiceUnavailable("503"), {"ok": 1}], None, [True] * 3),
+    ([gexc.ServiceUnavailable("503")], "unavailable", [True] * (RETRIES + 1)),
+    ([gexc.TooManyRequests("429")], "rate_limit", [True] * (RETRIES + 1)),
+    ([gexc.DeadlineExceeded("slow")], "timeout", [True] * (RETRIES + 1)),
+    # ...anything else fails at once
+    ([gexc.PermissionDenied("key")], "auth", [True]),
+    ([ValueError("odd")], "error", [True]),
+])
+def test_with_retries(outcomes, kind, schemas):
+    send, calls = scripted(*outcomes)
+    result, info = with_retries("breakdown", send)
+    assert calls == schemas and info["attempts"] == len(schemas)
+    if kind is None: assert result == {"ok": 1}
+    else: assert isinstance(result, CallError) and result.kind == kind and result.attempts == len(schemas)
+
+def test_every_attempt_is_charged(monkeypatch):
+    class Counter:
+        n = 0
+        def acquire(self): self.n += 1
+    limiter = Counter()
+    monkeypatch.setattr(gemini, "request_limiter", limiter)
+    send, calls = scripted(gexc.ServiceUnavailable("503"), {"ok": 1})
+    with_retries("recipe", send)
+    assert limiter.n == len(calls) == 2
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setitem(fakegemini.CONFIG, "latency", 0.0)
+    monkeypatch.setitem(fakegemini.CONFIG, "jitter", 0.0)
+    return fakegemini.FakeGenerativeModel()
+
+def test_call_model_complete(fake):
+    data = call_model(fake, breakdown_prompt("Pad Thai", 2), "breakdown")
+    assert type(data) is dict and data["core"][0] == "Pad Thai base"
+
+def test_call_model_cut_off(fake, monkeypatch):
+    monkeypatch.setitem(fakegemini.CONFIG, "malformed_rate", 1.0)
+    data = call_model(fake, breakdown_prompt("Ramen", 2), "breakdown")
+    assert isinstance(data, (Partial, CallError))
+    assert not gemini.complete(data)
+
+def test_call_model_gives_up_on_errors(fake, monkeypatch):
+    monkeypatch.setitem(fakegemini.CONFIG, "error_rate", 1.0)
+    data = call_model(fake, breakdown_prompt("Tacos", 2), "breakdown")
+    assert isinstance(data, CallError) and data.kind == "unavailable" and data.attempts == RETRIES + 1
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from concurrency import SingleFlight
+
+class Rerun(BaseException):
+    # Stands in for Streamlit's RerunException/StopException
+    pass
+
+def follow(flight, key, fn, out):
+    thread = threading.Thread(target=lambda: out.append(flight.do(key, fn, timeout=5)))
+    thread.start()
+    return thread
+
+def test_followers_share_the_result():
+    flight, started, out = SingleFlight(), threading.Event(), []
+    def slow():
+        started.set()
+        time.sleep(0.1)
+        return "ok"
+    leader = follow(flight, "k", slow, out)
+    started.wait()
+    follower = follow(flight, "k", lambda: "not called", out)
+    leader.join(), follower.join()
+    assert out == ["ok", "ok"] and flight.followers == 1
+
+def test_followers_share_exceptions():
+    flight, started = SingleFlight(), threading.Event()
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("boom")
+    errors = []
+    def run(fn):
+        try: flight.do("k", fn, timeout=5)
+        except ValueError as e: errors.append(e)
+    leader = threading.Thread(target=run, args=(failing,))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=run, args=(lambda: "not called",))
+    follower.start()
+    leader.join(), follower.join()
+    assert len(errors) == 2
+
+def test_interrupted_leader_hands_over():
+    flight, started, out = SingleFlight(), threading.Event(), []
+    def interrupted():
+        started.set()
+        time.sleep(0.1)
+        raise Rerun()
+    def leader():
+        with pytest.raises(Rerun): flight.do("k", interrupted, timeout=5)
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    follower = follow(flight, "k", lambda: "own call", out)
+    thread.join(), follower.join()
+    assert out == ["own call"] and flight.in_flight() == 0
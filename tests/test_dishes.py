@@ -0,0 +1,43 @@
+import pytest
+
+from dishes import PROMOTE, DishCatalog
+
+SEEDS = ["Pad Thai", "Chicken Tikka Masala", "Chicken Curry", "Spaghetti Carbonara", "Chicken Soup", "Salad", "Squash",
+         "Beef Soup", "Ramen"]
+
+@pytest.fixture
+def catalog(tmp_path):
+    return DishCatalog(path=str(tmp_path / "dishes.db"), seeds=SEEDS)
+
+@pytest.mark.parametrize("text, name", [
+    ("carbonara pasta", "Spaghetti Carbonara"),
+    ("pad tai", "Pad Thai"),
+    ("Chiken Curry", "Chicken Curry"),
+    # Added or missing words are a different dish, however close the spelling
+    ("Chicken Pad Thai", "Chicken Pad Thai"),
+    ("Chicken Tikka", "Chicken Tikka"),
+    # A generic carrier can stand in for another, but not appear or disappear
+    ("Chicken Noodle Soup", "Chicken Noodle Soup"),
+    ("Pasta Salad", "Pasta Salad"),
+    ("Spaghetti Squash", "Spaghetti Squash"),
+    ("Beef Noodle Soup", "Beef Noodle Soup"),
+    ("Ramen noodles", "Ramen noodles"),
+])
+def test_canonical(catalog, text, name):
+    assert catalog.canonical(text) == name
+
+def test_typos_never_take_over_a_known_name(catalog):
+    for _ in range(PROMOTE): catalog.add("Chiken Curry")
+    assert catalog.canonical("Chicken Curry") == "Chicken Curry"
+    assert "Chiken Curry" not in catalog.suggestions()
+
+def test_new_dishes_need_repeat_hits(tmp_path, catalog):
+    catalog.add("Beef Rendang")
+    assert "Beef Rendang" not in catalog.suggestions()
+    assert catalog.canonical("beef rendang") == "beef rendang"
+    for _ in range(PROMOTE - 1): catalog.add("Beef Rendang")
+    assert "Beef Rendang" in catalog.suggestions()
+    assert catalog.canonical("beef rendang") == "Beef Rendang"
+    # ...and stay promoted across restarts
+    again = DishCatalog(path=str(tmp_path / "dishes.db"), seeds=SEEDS)
+    assert again.canonical("beef rendang") == "Beef Rendang"
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import gemini
+from concurrency import Overloaded, PriorityGate, QueueTimeout
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def queue(gate, priority, order):
+    def run():
+        gate.acquire(priority, timeout=5)
+        order.append(priority)
+        gate.release()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_admits_by_priority_then_arrival():
+    gate, order = PriorityGate(1, 16), []
+    assert gate.acquire() == 0.0
+    threads = []
+    for n, priority in enumerate([2, 0, 1, 0]):
+        threads.append(queue(gate, priority, order))
+        wait_for(lambda: gate.stats()["waiting"] == n + 1)
+    gate.release()
+    for thread in threads: thread.join()
+    assert order == [0, 0, 1, 2]
+    assert gate.stats()["active"] == 0
+
+@pytest.mark.parametrize("priority, room", [(0, 4), (1, 2), (2, 1), (3, 1)])
+def test_lower_classes_are_shed_first(priority, room):
+    # Class p is turned away once max_queue >> p callers are waiting (never less than one)
+    gate = PriorityGate(1, 4)
+    gate.acquire()
+    def wait_briefly():
+        with pytest.raises(QueueTimeout): gate.acquire(0, timeout=0.3)
+    for n in range(room): threading.Thread(target=wait_briefly).start()
+    wait_for(lambda: gate.stats()["waiting"] == room)
+    with pytest.raises(Overloaded): gate.acquire(priority, timeout=1)
+    assert gate.stats()["shed"] == 1
+
+def test_timeout_zero_only_takes_free_room():
+    gate = PriorityGate(1, 4)
+    gate.acquire(0, 0)
+    with pytest.raises(Overloaded): gate.acquire(0, 0)
+
+def test_queue_timeout_leaves_the_queue():
+    gate = PriorityGate(1, 4)
+    gate.acquire()
+    with pytest.raises(QueueTimeout): gate.acquire(0, timeout=0.05)
+    assert gate.stats()["waiting"] == 0 and gate.stats()["timeouts"] == 1
+
+def test_hand_off_keeps_the_slot_until_the_request_finishes(monkeypatch):
+    gate = PriorityGate(1, 4)
+    monkeypatch.setattr(gemini, "upstream", gate)
+    request = Future()
+    def send(hand_off):
+        hand_off(request)
+        return {"ok": 1}   # returns first, as a winning hedge does
+    assert gemini.admitted("recipe", None, None, send) == {"ok": 1}
+    assert gate.stats()["active"] == 1
+    request.set_result(None)
+    assert gate.stats()["active"] == 0
+
+def test_slot_released_without_hand_off(monkeypatch):
+    gate = PriorityGate(1, 4)
+    monkeypatch.setattr(gemini, "upstream", gate)
+    def fail(hand_off):
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError): gemini.admitted("recipe", None, None, fail)
+    assert gate.stats()["active"] == 0
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from gemini import MAX_OUTPUT, THINKING_HEADROOM, CallError, Partial, complete, generation_config, parse_response, salvage_json
+from recipe import Recipe
+
+def response(text):
+    return SimpleNamespace(text=text)
+
+@pytest.mark.parametrize("text, expected, partial", [
+    ('{"core": ["Rice noodles"], "character": ["Lime"]}', {"core": ["Rice noodles"], "character": ["Lime"]}, False),
+    ('```json\n{"core": ["Rice noodles"]}\n```', {"core": ["Rice noodles"]}, False),   # wrapped, but whole
+    ('{"core": ["Rice noodles", "Shri', {"core": ["Rice noodles"]}, True),             # cut off at the limit
+])
+def test_parse_response(text, expected, partial):
+    info = {}
+    data = parse_response(response(text), "breakdown", info)
+    assert data == expected
+    assert isinstance(data, Partial) == partial == info.get("partial", False)
+    assert complete(data) != partial
+
+@pytest.mark.parametrize("text, kind", [
+    ("Sorry, I can't help with that.", "invalid_response"),
+    ('{"core": [', "invalid_response"),
+])
+def test_parse_response_errors(text, kind):
+    data = parse_response(response(text), "breakdown", {})
+    assert isinstance(data, CallError) and data.kind == kind
+
+def test_blocked_response():
+    class Blocked:
+        @property
+        def text(self): raise ValueError("no parts")
+    assert parse_response(Blocked(), "recipe", {}).kind == "blocked"
+
+def test_partial_recipe_stays_partial():
+    recipe = Recipe("Pad Thai", salvage_json('{"steps": ["Soak the noodles."], "chef_tip": "Do'), servings=2)
+    assert recipe.partial and recipe.rescaled(4)[0].partial
+    assert not complete(recipe.rescaled(4)[0].to_dict())
+
+@pytest.mark.parametrize("model, headroom", [
+    ("models/gemini-1.5-flash", 0),
+    ("models/gemini-2.0-flash", 0),
+    ("models/gemini-2.5-flash", THINKING_HEADROOM),
+    ("models/gemini-3-pro-preview", THINKING_HEADROOM),
+])
+def test_thinking_models_get_headroom(model, headroom):
+    assert generation_config("breakdown", model_name=model)["max_output_tokens"] == MAX_OUTPUT["breakdown"] + headroom
+
+def test_budget_spent_before_any_text():
+    class ThoughtOnly:
+        candidates = [SimpleNamespace(finish_reason=SimpleNamespace(name="MAX_TOKENS"))]
+        @property
+        def text(self): raise ValueError("no parts")
+    assert parse_response(ThoughtOnly(), "breakdown", {}).kind == "truncated"
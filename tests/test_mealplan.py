@@ -0,0 +1,33 @@
+import pytest
+
+from mealplan import ShoppingList, item_key, parse_dishes
+from recipe import Ingredients
+
+@pytest.mark.parametrize("a, b", [
+    ("Fresh cilantro", "Coriander leaves"),
+    ("Garlic cloves", "Garlic"),
+    ("Onions", "Onion"),
+])
+def test_same_item(a, b):
+    assert item_key(a) == item_key(b)
+
+@pytest.mark.parametrize("a, b", [
+    ("Peanut butter", "Butter"),
+    ("Chicken stock", "Beef stock"),
+    ("Red wine vinegar", "Red wine"),
+    ("Fresh cilantro", "Ground coriander"),
+])
+def test_different_items(a, b):
+    assert item_key(a) != item_key(b)
+
+def test_shopping_list_keeps_every_name():
+    shopping = ShoppingList()
+    shopping.add("Satay", Ingredients(["Peanut butter", "Chicken stock"], ["Fresh cilantro"]))
+    shopping.add("Stew", Ingredients(["Butter", "Beef stock", "Red wine vinegar"], ["Ground coriander", "Cilantro"]))
+    core, character = shopping.sections()
+    assert sorted(i.name for i in core) == ["Beef stock", "Butter", "Chicken stock", "Peanut butter", "Red wine vinegar"]
+    assert [(i.name, i.dishes) for i in character] == [("Fresh cilantro", ["Satay", "Stew"]), ("Ground coriander", ["Stew"])]
+
+def test_parse_dishes_keeps_different_dishes():
+    text = "Chicken Soup\nChicken Noodle Soup\nSalad, Pasta Salad; salad\n\n  chicken   soup "
+    assert parse_dishes(text) == ["Chicken Soup", "Chicken Noodle Soup", "Salad", "Pasta Salad"]
@@ -0,0 +1,31 @@
+import json
+import os
+
+import metrics
+from metrics import Metrics
+
+def events(path):
+    with open(os.path.join(path, "events.jsonl")) as f: return [json.loads(line) for line in f]
+
+def test_log_is_buffered(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "LOG_BUFFER", 3)
+    m = Metrics(path=str(tmp_path))
+    m.observe("api.recipe", 0.5)
+    m.observe("api.recipe", 0.7)
+    assert not os.path.exists(tmp_path / "events.jsonl")
+    m.observe("api.recipe", 0.9)
+    assert [e["seconds"] for e in events(tmp_path)] == [0.5, 0.7, 0.9]
+
+def test_flush_writes_the_rest(tmp_path):
+    m = Metrics(path=str(tmp_path))
+    m.observe("parse", 0.01, stage="recipe")
+    m.flush()
+    assert events(tmp_path)[0]["stage"] == "recipe"
+
+def test_log_rotates(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "LOG_BUFFER", 1)
+    monkeypatch.setattr(metrics, "LOG_MAX_BYTES", 200)
+    m = Metrics(path=str(tmp_path))
+    for _ in range(20): m.observe("api.recipe", 0.5, stage="recipe")
+    assert os.path.getsize(tmp_path / "events.jsonl") <= 400
+    assert os.path.exists(tmp_path / "events.jsonl.1")
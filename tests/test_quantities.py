@@ -0,0 +1,39 @@
+from fractions import Fraction
+
+import pytest
+
+from quantities import rescale_line, rescale_text
+
+DOUBLE, HALF = Fraction(2), Fraction(1, 2)
+
+@pytest.mark.parametrize("line, factor, expected, status", [
+    ("200g spaghetti", DOUBLE, "400g spaghetti", "scaled"),
+    ("1 1/2 cups flour", DOUBLE, "3 cups flour", "scaled"),
+    ("1 1/2 cups flour", HALF, "3/4 cup flour", "scaled"),
+    ("½ tsp salt", DOUBLE, "1 tsp salt", "scaled"),
+    ("1 ½ tsp salt", DOUBLE, "3 tsp salt", "scaled"),
+    ("2-3 cloves garlic", DOUBLE, "4-6 cloves garlic", "scaled"),
+    ("2 eggs", DOUBLE, "4 eggs", "scaled"),
+    ("Eggs (2 large)", DOUBLE, "Eggs (4 large)", "scaled"),
+    ("0.5 kg beef", HALF, "0.25 kg beef", "scaled"),
+    ("Salt to taste", DOUBLE, "Salt to taste", "unscaled"),
+    ("Juice of half a lemon", DOUBLE, "Juice of half a lemon", "unparsed"),
+    # Numbers that are part of a name: the measured amount is scaled, the name is left alone
+    ("Type 00 flour, 500g", DOUBLE, "Type 00 flour, 1000g", "scaled"),
+    ("Chinese 5-spice powder, 1 tsp", DOUBLE, "Chinese 5-spice powder, 2 tsp", "scaled"),
+    ("2% milk, 1 cup", DOUBLE, "2% milk, 2 cups", "scaled"),
+    # ...and with no measured amount to fall back on, the model gets the line
+    ("2% milk", DOUBLE, "2% milk", "unparsed"),
+    ("Chinese 5-spice powder", DOUBLE, "Chinese 5-spice powder", "unparsed"),
+    ("Type 00 flour", DOUBLE, "Type 00 flour", "unparsed"),
+])
+def test_rescale_line(line, factor, expected, status):
+    assert rescale_line(line, factor) == (expected, status)
+
+@pytest.mark.parametrize("text, expected", [
+    ("Add 200g pasta and 2 tbsp oil, cook 10 minutes at 180C.", "Add 400g pasta and 4 tbsp oil, cook 10 minutes at 180C."),
+    ("Sprinkle 1 tsp of 5-spice.", "Sprinkle 2 tsp of 5-spice."),
+    ("Stir in the 2% milk.", "Stir in the 2% milk."),
+])
+def test_rescale_text(text, expected):
+    assert rescale_text(text, DOUBLE) == expected
@@ -0,0 +1,51 @@
+import pytest
+
+from substitutes import index, swap_recipe
+
+@pytest.mark.parametrize("name, canonical", [
+    ("Fresh basil", "basil"),
+    ("Basil leaves", "basil"),
+    ("Cilantro", "coriander"),
+    ("Garlic cloves", "garlic"),
+    ("Heavy cream", "cream"),
+    ("Peanut butter", None),
+    ("Cream cheese", None),
+    ("Coconut cream", None),
+    ("Red wine vinegar", None),
+    ("Beef stock", None),
+    ("Sweet chili sauce", None),
+    ("Ground coriander", None),
+    ("Thai basil", None),
+    ("Garlic powder", None),
+])
+def test_canonical(name, canonical):
+    assert index.canonical(name) == canonical
+
+def recipe(*lines, steps=()):
+    return {"ingredients_list": list(lines), "steps": list(steps), "pivot_strategy": ""}
+
+def swap(data, *missing):
+    return swap_recipe(data, index.cover(missing).values(), "pivot")
+
+def test_measured_line_keeps_amount():
+    out = swap(recipe("200 g spaghetti", "2 tbsp butter, melted"), "Butter")
+    assert out["ingredients_list"] == ["200 g spaghetti", "2 tbsp olive oil"]
+
+def test_untouched_ingredients_stay():
+    out = swap(recipe("1 tbsp butter", "2 tbsp fresh basil", steps=["Tear the basil over the butter."]), "Fresh basil")
+    assert out["ingredients_list"][0] == "1 tbsp butter"
+    assert out["steps"] == ["Tear the oregano over the butter."]
+
+def test_note_replaces_quantity():
+    out = swap(recipe("2 garlic cloves", "1 onion"), "Garlic")
+    assert out["ingredients_list"][0] == "garlic powder (1/8 tsp per clove, instead of 2 garlic cloves)"
+
+@pytest.mark.parametrize("lines, missing", [
+    (["2 tbsp peanut butter", "1 tbsp butter"], "Butter"),          # peanut butter would become "peanut olive oil"
+    (["2 garlic cloves", "1 tsp garlic powder"], "Garlic"),          # "garlic powder powder"
+    (["1 handful Thai basil"], "Basil"),                             # not on the list at all
+    (["3 sprigs thyme"], "Thyme"),                                   # a sprig of oregano isn't the same amount
+    (["Juice of 1 lemon"], "Lemon"),                                 # no line that is just the lemon
+])
+def test_falls_back_to_model(lines, missing):
+    assert swap(recipe(*lines), missing) is None